@@ -1,8 +1,9 @@
 import os
 import traceback
 import sys
+from functools import cached_property, partial
 from types import TracebackType
-from typing import Type
+from typing import TYPE_CHECKING, Type
 
 from PyQt6 import QtCore
 from PyQt6.QtCore import Qt
@@ -19,12 +20,12 @@ from PyQt6.QtWidgets import (
     QApplication,
     QMainWindow,
     QStackedWidget,
-    QFileDialog
+    QFileDialog,
+    QInputDialog
 )
 
 from app import __appname__, __version__
 from app.actions import ToolBarActions
-from app.canvas import Canvas
 from app.controllers.annotation_controller import AnnotationController
 from app.controllers.button_controller import ButtonController
 from app.controllers.image_controller import ImageController
@@ -33,20 +34,26 @@ from app.controllers.logging_controller import LoggingController
 from app.enums.settings import Setting
 from app.exceptions.io import IOException, InvalidCOCOException
 from app.exceptions.label_map import LabelMapException
+from app.handlers.actions import ActionEditCategories
+from app.handlers.batch import CategoryJob
 from app.settings import Settings
-from app.widgets.sidebar.annotation_list import AnnotationList
 from app.widgets.message_box import (
+    ConfirmEditCategoriesBox,
     ConfirmImportBox,
     ConfirmExitBox,
     ImportFailedBox,
     InformationBox
 )
-from app.widgets.settings.settings_window import SettingsWindow
 from app.widgets.toast import Toast
 from app.screens.home_screen import HomeScreen
-from app.screens.main_screen import MainScreen
 from app.widgets.toolbar import ToolBar
 
+if TYPE_CHECKING:
+    from app.canvas import Canvas
+    from app.screens.main_screen import MainScreen
+    from app.widgets.settings.settings_window import SettingsWindow
+    from app.widgets.sidebar.annotation_list import AnnotationList
+
 __basepath__ = sys._MEIPASS if hasattr(sys, '_MEIPASS') else '.'
 __stylepath__ = os.path.join(__basepath__, 'app', 'styles', 'app.qss')
 
@@ -76,27 +83,62 @@ class MainWindow(QMainWindow):
         self.toolbar = ToolBar(self.toolbar_actions)
         self.addToolBar(Qt.ToolBarArea.LeftToolBarArea, self.toolbar)
 
-        self.settings_window = SettingsWindow(self)
-
-        self.canvas = Canvas(self)
-        self.annotation_list = AnnotationList(self)
-
         self.home_screen = HomeScreen(__homepath__, __homepath_alt__)
-        self.main_screen = MainScreen(self)
 
         self.screens = QStackedWidget()
         self.screens.addWidget(self.home_screen)
-        self.screens.addWidget(self.main_screen)
 
         self.setCentralWidget(self.screens)
         self.screens.setCurrentWidget(self.home_screen)
 
-        self.full_screen_toast = Toast(
-            self, 'Press F11 again to exit full screen')
+    # The widgets below are only needed once a directory is opened or a
+    # menu is shown, so they are built and imported on first access
+
+    @cached_property
+    def settings_window(self) -> 'SettingsWindow':
+        from app.widgets.settings.settings_window import SettingsWindow
+
+        return SettingsWindow(self)
+
+    @cached_property
+    def canvas(self) -> 'Canvas':
+        from app.canvas import Canvas
+
+        return Canvas(self)
 
-        self.keypoints_hidden_toast = Toast(
+    @cached_property
+    def annotation_list(self) -> 'AnnotationList':
+        from app.widgets.sidebar.annotation_list import AnnotationList
+
+        return AnnotationList(self)
+
+    @cached_property
+    def main_screen(self) -> 'MainScreen':
+        from app.screens.main_screen import MainScreen
+
+        main_screen = MainScreen(self)
+        self.screens.addWidget(main_screen)
+
+        return main_screen
+
+    @cached_property
+    def full_screen_toast(self) -> Toast:
+        return Toast(self, 'Press F11 again to exit full screen')
+
+    @cached_property
+    def keypoints_hidden_toast(self) -> Toast:
+        return Toast(
             self, 'Cannot add keypoints while \'Hide keypoints\' is enabled')
 
+    @property
+    def is_busy(self) -> bool:
+        """Whether a batch job is writing the annotation files, during which
+        the image can't be changed."""
+        return self.is_loaded('canvas') and self.canvas.batch_handler.running
+
+    def is_loaded(self, name: str) -> bool:
+        return name in vars(self)
+
     def reload(self) -> None:
         image_path = self.image_controller.get_image_path()
         image_name = self.image_controller.get_image_name()
@@ -135,14 +177,23 @@ class MainWindow(QMainWindow):
             self.reload()
 
     def next_image(self) -> None:
+        if self.is_busy:
+            return
+
         self.image_controller.next_image()
         self.reload()
 
     def prev_image(self) -> None:
+        if self.is_busy:
+            return
+
         self.image_controller.prev_image()
         self.reload()
 
     def go_to_image(self, index: int) -> None:
+        if self.is_busy:
+            return
+
         self.image_controller.go_to_image(index)
         self.reload()
 
@@ -180,6 +231,91 @@ class MainWindow(QMainWindow):
 
         return file_path
 
+    def prompt_edit_categories(self) -> None:
+        if self.is_busy:
+            return
+
+        title = 'Edit Categories'
+        label_names = self.canvas.label_names
+
+        operation, accepted = QInputDialog.getItem(
+            self, title, 'Operation:',
+            ['Rename', 'Merge', 'Delete', 'Update keypoints'], editable=False)
+
+        if not accepted:
+            return
+
+        if operation == 'Update keypoints':
+            self.edit_categories({name: name for name in label_names},
+                                 'updated to the keypoints of the label map')
+            return
+
+        source, accepted = QInputDialog.getItem(
+            self, title, 'Category:', label_names, editable=True)
+
+        if not (accepted and source):
+            return
+
+        if operation == 'Delete':
+            self.edit_categories({source: None}, 'deleted')
+            return
+
+        # Annotations can only be exported under names of the label map
+        target, accepted = QInputDialog.getItem(
+            self, title,
+            'New name:' if operation == 'Rename' else 'Merge into:',
+            [name for name in label_names if name != source],
+            editable=False)
+
+        if accepted and target and target != source:
+            change = 'renamed to' if operation == 'Rename' else 'merged into'
+            self.edit_categories({source: target}, f'{change} \'{target}\'')
+
+    def edit_categories(self,
+                        label_names: dict[str, str | None],
+                        change: str
+                        ) -> None:
+        """Apply `label_names` to the annotations of every image as a single
+        action, once the number of annotations it changes is confirmed."""
+        if self.is_busy:
+            return
+
+        label_map = self.label_map_controller
+
+        for target_name in label_names.values():
+            if target_name is not None and not label_map.contains(target_name):
+                message = f'\'{target_name}\' is not in the label map.'
+                InformationBox(self, 'Edit Categories', message).exec()
+
+                return
+
+        image_names = self.image_controller.image_names
+        self.canvas.save_progress()
+
+        self.canvas.batch_handler.start(
+            CategoryJob(image_names, label_names, dry_run=True),
+            partial(self._confirm_categories, change=change))
+
+    def _confirm_categories(self,
+                            dry_run: CategoryJob,
+                            changes: dict[str, int],
+                            change: str
+                            ) -> None:
+        if dry_run.cancelled:
+            return
+
+        if not changes:
+            InformationBox(self, 'Edit Categories',
+                           'No annotations would be changed.').exec()
+            return
+
+        if not ConfirmEditCategoriesBox(
+                self, sum(changes.values()), len(changes), change).exec():
+            return
+
+        self.canvas.action_handler.register_action(ActionEditCategories(
+            self.canvas, dry_run.label_names, list(dry_run.image_names)))
+
     def import_annotations(self, annotations_path: str) -> None:
         if self.annotation_controller.import_annotations(annotations_path):
             image_name = self.image_controller.get_image_name()
@@ -193,7 +329,9 @@ class MainWindow(QMainWindow):
     def export_annotations(self, output_path: str) -> None:
         self.canvas.save_progress()
 
-        self.annotation_controller.export_annotations(output_path)
+        if self.annotation_controller.export_annotations(output_path):
+            self.canvas.action_handler.reset()
+
         self.reload()
 
     def open_settings(self) -> None:
@@ -236,7 +374,13 @@ class MainWindow(QMainWindow):
                 self.open_dir(file_path.toLocalFile())
 
     def closeEvent(self, event: QCloseEvent) -> None:
-        self.canvas.save_progress()
+        # Leave the files of a running batch job complete
+        if self.is_busy:
+            event.ignore()
+            return
+
+        if self.is_loaded('canvas'):
+            self.canvas.save_progress()
 
         if not self.annotation_controller.has_annotations():
             return
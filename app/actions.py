@@ -64,6 +64,10 @@ def create_keypoints(parent: 'MainWindow') -> None:
         parent.canvas.set_annotating_state(AnnotatingState.DRAWING_KEYPOINTS)
 
 
+def edit_categories(parent: 'MainWindow') -> None:
+    parent.prompt_edit_categories()
+
+
 def search_image(parent: 'MainWindow') -> None:
     parent.canvas.on_search_image()
 
@@ -157,6 +161,50 @@ def paste_annotations_replace(parent: 'Canvas') -> None:
     parent.paste_annotations(replace_existing=True)
 
 
+def propagate_annotations(parent: 'Canvas') -> None:
+    parent.propagate_annotations()
+
+
+def toggle_auto_levels(parent: 'Canvas') -> None:
+    parent.brightness_handler.toggle_auto_levels()
+    parent.update()
+
+
+def increase_contrast(parent: 'Canvas') -> None:
+    parent.brightness_handler.increase_contrast()
+    parent.update()
+
+
+def decrease_contrast(parent: 'Canvas') -> None:
+    parent.brightness_handler.decrease_contrast()
+    parent.update()
+
+
+def narrow_window(parent: 'Canvas') -> None:
+    parent.brightness_handler.narrow_window()
+    parent.update()
+
+
+def widen_window(parent: 'Canvas') -> None:
+    parent.brightness_handler.widen_window()
+    parent.update()
+
+
+def increase_level(parent: 'Canvas') -> None:
+    parent.brightness_handler.increase_level()
+    parent.update()
+
+
+def decrease_level(parent: 'Canvas') -> None:
+    parent.brightness_handler.decrease_level()
+    parent.update()
+
+
+def reset_window(parent: 'Canvas') -> None:
+    parent.brightness_handler.reset_window()
+    parent.update()
+
+
 def undo_action(parent: 'Canvas') -> None:
     parent.action_handler.undo()
 
@@ -175,6 +223,8 @@ __toolbar_actions__ = (
     ('bbox', create_bbox, 'W', 'Box', 'bbox.png', False),
     ('keypoints', create_keypoints, 'R', 'Points', 'keypoints.png', False),
     ('search_image', search_image, 'Ctrl+F', 'Search Image', None, False),
+    ('edit_categories', edit_categories, 'Ctrl+Shift+E', 'Edit Categories',
+     None, False),
     ('hide_sidebar', hide_sidebar, 'Shift+Tab', 'Hide Sidebar', None, False),
     ('full_screen', full_screen, 'F11', 'Full Screen', None, True),
     ('settings', open_settings, 'F12', 'Settings', 'settings.png', True),
@@ -193,8 +243,17 @@ __canvas_actions__ = (
     ('copy_annos', copy_annotations, 'Ctrl+C'),
     ('paste_annos', paste_annotations, 'Ctrl+Shift+V'),
     ('paste_annos_replace', paste_annotations_replace, 'Ctrl+V'),
+    ('propagate_annos', propagate_annotations, 'Ctrl+P'),
     ('undo', undo_action, 'Ctrl+Z'),
-    ('redo', redo_action, 'Ctrl+Y')
+    ('redo', redo_action, 'Ctrl+Y'),
+    ('auto_levels', toggle_auto_levels, 'Ctrl+Shift+L'),
+    ('increase_contrast', increase_contrast, 'Ctrl+Shift+Up'),
+    ('decrease_contrast', decrease_contrast, 'Ctrl+Shift+Down'),
+    ('narrow_window', narrow_window, 'Ctrl+Shift+Left'),
+    ('widen_window', widen_window, 'Ctrl+Shift+Right'),
+    ('increase_level', increase_level, 'Ctrl+Shift+PgUp'),
+    ('decrease_level', decrease_level, 'Ctrl+Shift+PgDown'),
+    ('reset_window', reset_window, 'Ctrl+Shift+W')
 )
 
 
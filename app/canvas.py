@@ -1,6 +1,5 @@
-import copy
 import os
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Collection
 
 from PyQt6.QtCore import Qt, QTimer, QPoint
 from PyQt6.QtGui import (
@@ -12,18 +11,20 @@ from PyQt6.QtGui import (
     QResizeEvent,
     QPaintEvent
 )
-from PyQt6.QtWidgets import QApplication, QWidget
+from PyQt6.QtWidgets import QApplication, QInputDialog, QWidget
 
 from app.actions import CanvasActions
+from app.controllers.annotation_controller import annotation_to_json
 from app.controllers.label_map_controller import LabelMapController
 from app.enums.annotation import HoverType, SelectionType, VisibilityType
 from app.enums.canvas import AnnotatingState
 from app.enums.settings import Setting
 from app.handlers.actions import (
-    ActionHandler,
     ActionCreate,
     ActionDelete,
     ActionMove,
+    ActionMoveSelection,
+    ActionPropagate,
     ActionRename,
     ActionAddBbox,
     ActionDeleteBbox,
@@ -33,17 +34,21 @@ from app.handlers.actions import (
     ActionFlipKeypoints
 )
 from app.handlers.annotator import KeypointAnnotator
+from app.handlers.batch import BatchHandler
+from app.handlers.geometry import AnnotationGeometry
+from app.handlers.history import ActionHandler
 from app.handlers.keyboard import KeyboardHandler
 from app.handlers.mouse import MouseHandler
 from app.handlers.painter import CanvasPainter
+from app.handlers.transform import SelectionTransform
 from app.handlers.image.brightness import BrightnessHandler
 from app.handlers.image.zoom import ZoomHandler
 from app.handlers.visibility import VisibilityHandler
 from app.widgets.combo_box import AnnotationComboBox, ImageComboBox
 from app.widgets.context_menu import ContextMenu
 from app.widgets.canvas.invalid_image import InvalidImageBanner
-from app.objects import Annotation, Keypoint
-from app.utils import clip_value
+from app.objects import Annotation, AnnotationSnapshot, Keypoint
+from app.utils import clip_value, parse_range
 
 if TYPE_CHECKING:
     from annotator import MainWindow
@@ -70,7 +75,15 @@ class Canvas(QWidget):
         self.annotating_state = AnnotatingState.IDLE
         self.anno_first_corner = None
 
-        self.annotations = []
+        # Annotations by reference ID, in drawing order. Moving one to the
+        # front re-inserts it, and the list is rebuilt on the next access
+        self._annotation_index = {}
+        self._annotations = []
+
+        # Packed coordinates for hit-testing, rebuilt on the next hover
+        # once the annotations or their coordinates change
+        self._geometry = None
+
         self.selected_annos = []
         self.selected_keypoints = []
 
@@ -85,6 +98,7 @@ class Canvas(QWidget):
         self.setFocusPolicy(Qt.FocusPolicy.StrongFocus)
 
         self.action_handler = ActionHandler(self, self.image_name)
+        self.batch_handler = BatchHandler(self)
         self.visibility_handler = VisibilityHandler(self)
 
         self.brightness_handler = BrightnessHandler(self)
@@ -93,11 +107,33 @@ class Canvas(QWidget):
         self.invalid_image_banner = InvalidImageBanner(self)
 
         self.moving_anno = None
+        self.moving_selection = None
         self.pos_start_kpt = None
 
         for action in CanvasActions(self).actions.values():
             self.addAction(action)
 
+    @property
+    def annotations(self) -> list[Annotation]:
+        """Annotations of the image, from back to front."""
+        if self._annotations is None:
+            self._annotations = list(self._annotation_index.values())
+
+        return self._annotations
+
+    @annotations.setter
+    def annotations(self, annotations: list[Annotation]) -> None:
+        self._annotation_index = {anno.ref_id: anno for anno in annotations}
+        self._annotations = None
+        self._geometry = None
+
+    @property
+    def geometry(self) -> AnnotationGeometry:
+        if self._geometry is None:
+            self._geometry = AnnotationGeometry(self.annotations)
+
+        return self._geometry
+
     @property
     def label_map(self) -> LabelMapController:
         return self.parent.label_map_controller
@@ -163,7 +199,7 @@ class Canvas(QWidget):
             return
 
         self.pixmap = QPixmap.fromImage(image)
-        self.brightness_handler.set_pixmap(self.pixmap)
+        self.brightness_handler.set_image(image)
 
         self.unsaved_changes = True
         self.update()
@@ -176,7 +212,8 @@ class Canvas(QWidget):
         self.update()
 
     def save_progress(self) -> None:
-        if not self.unsaved_changes:
+        # A batch job may be writing the file, which is reloaded once done
+        if not self.unsaved_changes or self.batch_handler.running:
             return
 
         self.unsaved_changes = False
@@ -284,7 +321,8 @@ class Canvas(QWidget):
         elif state == AnnotatingState.DRAWING_ANNO:
             self.anno_first_corner = self.mouse_handler.cursor_position
 
-        elif state == AnnotatingState.MOVING_ANNO:
+        elif state == AnnotatingState.MOVING_ANNO \
+                and not self.moving_selection:
             anno = self.selected_annos[-1]
 
             self.moving_anno = self.moving_anno or {
@@ -296,7 +334,23 @@ class Canvas(QWidget):
             self.pos_start_kpt = self.pos_start_kpt \
                 or self.selected_keypoints[-1].position
 
+        if state not in (AnnotatingState.MOVING_ANNO,
+                         AnnotatingState.MOVING_KEYPOINT):
+            self.keyboard_handler.reset_nudge()
+
         if (previous_state == AnnotatingState.MOVING_ANNO
+                and state != AnnotatingState.MOVING_ANNO
+                and self.moving_selection):
+            transform = self.moving_selection
+            self.moving_selection = None
+
+            self.action_handler.register_action(ActionMoveSelection(
+                self,
+                transform.annotations,
+                transform.pos_start,
+                transform.kpts_start))
+
+        elif (previous_state == AnnotatingState.MOVING_ANNO
                 and state != AnnotatingState.MOVING_ANNO):
             anno = self.moving_anno['annotation']
             pos_start = self.moving_anno['pos_start']
@@ -318,19 +372,14 @@ class Canvas(QWidget):
         self.update()
 
     def unset_hovered_objects(self) -> None:
-        self.hovered_keypoint = None
-        self.hovered_anno = None
-
-        annotator = self.keypoint_annotator
+        if self.hovered_anno:
+            self.hovered_anno.hovered = HoverType.NONE
 
-        annotations = [annotator.annotation] if annotator.active \
-            else self.annotations
+        if self.hovered_keypoint:
+            self.hovered_keypoint.hovered = False
 
-        for anno in annotations:
-            anno.hovered = HoverType.NONE
-
-            for keypoint in anno.keypoints:
-                keypoint.hovered = False
+        self.hovered_keypoint = None
+        self.hovered_anno = None
 
     def set_hovered_object(self) -> None:
         self.unset_hovered_objects()
@@ -344,9 +393,9 @@ class Canvas(QWidget):
 
         annotator = self.keypoint_annotator
         annotations = [annotator.annotation] if annotator.active \
-            else self.annotations
+            else self.geometry.get_candidates(margin, mouse_pos)
 
-        for anno in annotations[::-1]:
+        for anno in annotations:
             hovered_kpt = anno.get_hovered_keypoint(margin, mouse_pos)
             hovered_type = anno.get_hovered_type(margin, mouse_pos)
 
@@ -364,45 +413,92 @@ class Canvas(QWidget):
                 return
 
     def set_selected_annotation(self, annotation: Annotation | None) -> None:
-        for anno in self.annotations:
+        for anno in self.selected_annos:
             anno.selected = SelectionType.UNSELECTED
 
         self.selected_annos = []
         self.add_selected_annotation(annotation)
 
+    def get_annotation(self, ref_id: str) -> Annotation | None:
+        return self._annotation_index.get(ref_id)
+
+    def get_annotations(self, ref_ids: Collection[str]) -> list[Annotation]:
+        """Annotations with the given reference IDs, from back to front."""
+        if len(ref_ids) == 1:
+            anno = self.get_annotation(next(iter(ref_ids)))
+            return [anno] if anno else []
+
+        return [anno for ref_id, anno in self._annotation_index.items()
+                if ref_id in ref_ids]
+
+    def contains_annotation(self, annotation: Annotation) -> bool:
+        return annotation.ref_id in self._annotation_index
+
+    def add_annotations(self, annotations: list[Annotation]) -> None:
+        """Place annotations in front, replacing any with the same ID."""
+        for anno in annotations:
+            self._annotation_index.pop(anno.ref_id, None)
+            self._annotation_index[anno.ref_id] = anno
+
+        self._annotations = None
+        self._geometry = None
+
+    def remove_annotations(self, ref_ids: Collection[str]) -> None:
+        for ref_id in ref_ids:
+            self._annotation_index.pop(ref_id, None)
+
+        self._annotations = None
+        self._geometry = None
+
+    def invalidate_geometry(self) -> None:
+        """Rebuild the packed coordinates once annotations have moved."""
+        self._geometry = None
+
     def add_selected_annotation(self, annotation: Annotation | None) -> None:
-        interactable = self.visibility_handler.interactable(annotation)
-        if not interactable or annotation in self.selected_annos:
+        self.add_selected_annotations([annotation])
+
+    def add_selected_annotations(self, annotations: list[Annotation]) -> None:
+        # Annotations are flagged as selected if and only if they are part
+        # of the selection, so the flag is checked instead of the list
+        added_annos = []
+
+        for anno in annotations:
+            if not self.visibility_handler.interactable(anno) \
+                    or anno.selected:
+                continue
+
+            anno.selected = SelectionType.SELECTED
+            anno.visible = anno.visible or VisibilityType.VISIBLE
+
+            added_annos.append(anno)
+
+        if not added_annos:
             return
 
         self.set_selected_keypoint(None)
-        self.selected_annos.append(annotation)
-
-        annotation.selected = SelectionType.SELECTED
-        annotation.visible = annotation.visible or VisibilityType.VISIBLE
+        self.selected_annos.extend(added_annos)
 
         # Move to the front
-        if annotation in self.annotations:
-            self.annotations.remove(annotation)
-            self.annotations.append(annotation)
+        self.add_annotations([anno for anno in added_annos
+                              if self.contains_annotation(anno)])
 
     def unselect_annotation(self, annotation: Annotation) -> None:
-        annotation.selected = SelectionType.UNSELECTED
+        if not annotation.selected:
+            return
 
-        if annotation in self.selected_annos:
-            self.selected_annos.remove(annotation)
+        annotation.selected = SelectionType.UNSELECTED
+        self.selected_annos.remove(annotation)
 
     def set_selected_keypoint(self, keypoint: Keypoint | None) -> None:
-        for anno in self.annotations:
-            for kpt in anno.keypoints:
-                kpt.selected = False
+        for kpt in self.selected_keypoints:
+            kpt.selected = False
 
         self.selected_keypoints = []
         self.add_selected_keypoint(keypoint)
 
     def add_selected_keypoint(self, keypoint: Keypoint | None) -> None:
         interactable = self.visibility_handler.interactable_kpt(keypoint)
-        if not interactable or keypoint in self.selected_keypoints:
+        if not interactable or keypoint.selected:
             return
 
         self.set_selected_annotation(None)
@@ -412,15 +508,14 @@ class Canvas(QWidget):
         keypoint.parent.visible = VisibilityType.VISIBLE
 
     def unselect_keypoint(self, keypoint: Keypoint) -> None:
-        if keypoint not in self.selected_keypoints:
+        if not keypoint.selected:
             return
 
         self.selected_keypoints.remove(keypoint)
         keypoint.selected = False
 
     def select_next_annotation(self) -> None:
-        list_items = self.parent.annotation_list.list_items
-        annos = [item.annotation for item in list_items if item.isEnabled()]
+        annos = self.parent.annotation_list.annotations
 
         if not annos:
             return
@@ -452,8 +547,7 @@ class Canvas(QWidget):
                 self.set_selected_annotation(None)
 
             else:
-                for annotation in visible_annos:
-                    self.add_selected_annotation(annotation)
+                self.add_selected_annotations(visible_annos)
 
         self.update()
 
@@ -586,7 +680,18 @@ class Canvas(QWidget):
         if self.selected_annos:
             to_copy = filter(lambda anno: anno.selected, to_copy)
 
-        self.clipboard = [copy.copy(anno) for anno in to_copy]
+        self.clipboard = [AnnotationSnapshot.from_annotation(
+            anno, box_only=anno.selected == SelectionType.BOX_ONLY)
+            for anno in to_copy]
+
+    def get_pasted_annotations(self) -> list[AnnotationSnapshot]:
+        """New copies of the clipboard, leaving out those that would be
+        pasted over an existing annotation."""
+        existing_positions = {tuple(anno.position or anno.implicit_bbox)
+                              for anno in self.annotations}
+
+        return [anno.copy() for anno in self.clipboard[::-1]
+                if anno.bbox not in existing_positions]
 
     def paste_annotations(self, replace_existing: bool) -> None:
         visible_annos = [anno for anno in self.annotations
@@ -596,16 +701,39 @@ class Canvas(QWidget):
             action = ActionDelete(self, visible_annos)
             self.action_handler.register_action(action)
 
-        existing_positions = [anno.position or anno.implicit_bbox
-                              for anno in self.annotations]
+        if pasted_annos := self.get_pasted_annotations():
+            action = ActionCreate.from_snapshots(self, pasted_annos)
+            self.action_handler.register_action(action)
 
-        pasted_annos = [copy.copy(anno) for anno in self.clipboard[::-1]
-                        if (anno.position or anno.implicit_bbox)
-                        not in existing_positions]
+    def propagate_annotations(self) -> None:
+        if not self.clipboard or self.batch_handler.running:
+            return
 
-        if pasted_annos:
-            action = ActionCreate(self, pasted_annos)
-            self.action_handler.register_action(action)
+        image_controller = self.parent.image_controller
+        num_images = image_controller.num_images
+
+        first_image = min(image_controller.index + 2, num_images)
+        text, accepted = QInputDialog.getText(
+            self, 'Propagate Annotations', 'Paste into images:',
+            text=f'{first_image}-{num_images}')
+
+        if not (accepted and (image_range := parse_range(text))):
+            return
+
+        first, last = (clip_value(index, 1, num_images)
+                       for index in image_range)
+        image_names = image_controller.image_names[first - 1:last]
+
+        pasted_annos = self.get_pasted_annotations() \
+            if self.image_name in image_names else []
+
+        anno_data = [annotation_to_json(anno.to_annotation())
+                     for anno in self.clipboard]
+
+        self.save_progress()
+        self.action_handler.register_action(ActionPropagate(
+            self, pasted_annos, anno_data,
+            [name for name in image_names if name != self.image_name]))
 
     def hide_annotations(self, target_visibility: VisibilityType) -> None:
         should_hide = all(anno.visible == VisibilityType.VISIBLE
@@ -658,6 +786,7 @@ class Canvas(QWidget):
                         ) -> None:
         x_min, y_min, x_max, y_max = anno.position or anno.implicit_bbox
         delta_x, delta_y = delta
+        self.invalidate_geometry()
 
         kpts_x, kpts_y = None, None
         edge_right, edge_bot = self.pixmap.width(), self.pixmap.height()
@@ -710,6 +839,20 @@ class Canvas(QWidget):
         else:
             anno.fit_bbox_to_keypoints()
 
+    def move_selection(self, delta: tuple[int, int]) -> None:
+        if not self.moving_selection:
+            self.moving_selection = SelectionTransform(
+                self, self.selected_annos, self.hovered_anno.hovered)
+
+            self.set_annotating_state(AnnotatingState.MOVING_ANNO)
+
+        if self.moving_selection.hover_type == HoverType.FULL:
+            self.moving_selection.translate(delta)
+        else:
+            self.moving_selection.scale(delta)
+
+        self.invalidate_geometry()
+
     def move_keypoint(self,
                       keypoint: Keypoint,
                       delta: tuple[int, int]
@@ -721,26 +864,37 @@ class Canvas(QWidget):
         pos_y = clip_value(pos_y + delta_y, 0, self.pixmap.height())
 
         keypoint.position = [pos_x, pos_y]
+        self.invalidate_geometry()
 
     def move_annotation_arrow(self, delta: tuple[int, int]) -> None:
         selected_anno = self.selected_annos[-1]
-        selection_type = selected_anno.selected
 
-        if selection_type == SelectionType.NEWLY_SELECTED:
-            selection_type = SelectionType.SELECTED
+        if self.keyboard_handler.nudge_target is not selected_anno:
+            selection_type = selected_anno.selected
+
+            if selection_type == SelectionType.NEWLY_SELECTED:
+                selection_type = SelectionType.SELECTED
+
+            self.set_annotating_state(AnnotatingState.IDLE)
+            self.set_selected_annotation(selected_anno)
+            selected_anno.selected = selection_type
 
-        self.set_selected_annotation(selected_anno)
-        selected_anno.selected = selection_type
+            self.set_annotating_state(AnnotatingState.MOVING_ANNO)
 
-        self.set_annotating_state(AnnotatingState.MOVING_ANNO)
         self.move_annotation(selected_anno, delta)
+        self.keyboard_handler.nudge(selected_anno)
 
     def move_keypoint_arrow(self, delta: tuple[int, int]) -> None:
         selected_keypoint = self.selected_keypoints[-1]
-        self.set_selected_keypoint(selected_keypoint)
 
-        self.set_annotating_state(AnnotatingState.MOVING_KEYPOINT)
+        if self.keyboard_handler.nudge_target is not selected_keypoint:
+            self.set_annotating_state(AnnotatingState.IDLE)
+            self.set_selected_keypoint(selected_keypoint)
+
+            self.set_annotating_state(AnnotatingState.MOVING_KEYPOINT)
+
         self.move_keypoint(selected_keypoint, delta)
+        self.keyboard_handler.nudge(selected_keypoint)
 
     def flip_keypoints(self) -> None:
         action = ActionFlipKeypoints(self, self.selected_annos[-1])
@@ -757,7 +911,7 @@ class Canvas(QWidget):
             self.unselect_all()
             return
 
-        if annotation in self.annotations:
+        if self.contains_annotation(annotation):
             action = ActionCreateKeypoints(self, created_keypoints)
         else:
             annotation.fit_bbox_to_keypoints()
@@ -784,6 +938,10 @@ class Canvas(QWidget):
         elif self.selected_keypoints:
             self.move_keypoint_arrow((delta_x, delta_y))
 
+        # Only repaint the canvas, which Qt does at most once per frame.
+        # The sidebar is refreshed once the nudges are registered.
+        super().update()
+
     def on_annotation_left_press(self, event: QMouseEvent) -> None:
         if self.annotating_state == AnnotatingState.MOVING_ANNO:
             return
@@ -828,7 +986,7 @@ class Canvas(QWidget):
                                event: QMouseEvent
                                ) -> None:
         if Qt.KeyboardModifier.ControlModifier & event.modifiers():
-            if keypoint in self.selected_keypoints:
+            if keypoint.selected:
                 self.unselect_keypoint(keypoint)
 
             else:
@@ -883,6 +1041,12 @@ class Canvas(QWidget):
             if self.hovered_keypoint:
                 self.move_keypoint(self.hovered_keypoint, cursor_shift)
 
+        elif self.hovered_anno and (self.moving_selection or (
+                len(self.selected_annos) > 1
+                and self.hovered_anno.selected
+                and self.hovered_anno.hovered != HoverType.NONE)):
+            self.move_selection(cursor_shift)
+
         elif self.hovered_anno:
             box_only = self.hovered_anno.selected == SelectionType.BOX_ONLY
 
@@ -900,10 +1064,20 @@ class Canvas(QWidget):
 
         self.update()
 
-    def on_mouse_right_drag(self, cursor_shift: tuple[int, int]) -> None:
+    def on_mouse_right_drag(self,
+                            cursor_shift: tuple[int, int],
+                            ctrl_pressed: bool
+                            ) -> None:
         if self.annotating_state == AnnotatingState.DRAWING_KEYPOINTS:
             self.keypoint_annotator.update()
 
+        if ctrl_pressed and self.brightness_handler.window:
+            self.brightness_handler.drag_window(
+                self.mouse_handler.drag_start_window, cursor_shift)
+
+            self.update()
+            return
+
         drag_start_x, drag_start_y = self.mouse_handler.drag_start_pan
         shift_x, shift_y = cursor_shift
 
@@ -943,7 +1117,9 @@ class Canvas(QWidget):
     def on_mouse_hover(self) -> None:
         if self.annotating_state in (AnnotatingState.MOVING_ANNO,
                                      AnnotatingState.MOVING_KEYPOINT):
-            self.set_annotating_state(AnnotatingState.IDLE)
+            # Nudges are registered once the arrow keys are released
+            if self.keyboard_handler.nudge_target is None:
+                self.set_annotating_state(AnnotatingState.IDLE)
 
         else:
             self.set_hovered_object()
@@ -996,17 +1172,20 @@ class Canvas(QWidget):
         self.update()
 
     def on_search_image(self) -> None:
-        image_names = [os.path.basename(path)
-                       for path in self.parent.image_controller.image_paths]
+        image_controller = self.parent.image_controller
+        manifest = self.parent.annotation_controller.manifest
+
+        self.save_progress()
 
-        combo_box = ImageComboBox(self, image_names)
+        combo_box = ImageComboBox(self, image_controller.search_index,
+                                  manifest)
         combo_box.exec(self.mouse_handler.global_position)
 
         selected_image = combo_box.selected_value
         if not selected_image:
             return
 
-        image_index = image_names.index(selected_image)
+        image_index = image_controller.image_indices[selected_image]
         self.parent.go_to_image(image_index + 1)
 
     def on_escape(self) -> None:
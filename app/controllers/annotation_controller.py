@@ -5,8 +5,6 @@ import shutil
 from collections import defaultdict
 from typing import TYPE_CHECKING
 
-from natsort import os_sorted
-
 from app.controllers.label_map_controller import (
     LabelMapController,
     LabelSchema
@@ -17,6 +15,7 @@ from app.exceptions.io import (
     InvalidSchemaException
 )
 from app.enums.settings import Setting
+from app.handlers.search import AnnotationManifest
 from app.objects import Annotation, Keypoint
 
 if TYPE_CHECKING:
@@ -28,6 +27,8 @@ class AnnotationController:
         self.settings = parent.settings
         self.parent = parent
 
+        self.manifest = AnnotationManifest(self.get_json_path)
+
     @property
     def label_map(self) -> LabelMapController:
         return self.parent.label_map_controller
@@ -42,6 +43,19 @@ class AnnotationController:
 
         return os.path.join(annotator_dir, json_name)
 
+    def get_history_path(self, image_name: str) -> str:
+        history_dir = os.path.join(self.image_dir, '.annotator', 'history')
+        log_name = f'{os.path.splitext(image_name)[0]}.log'
+
+        return os.path.join(history_dir, log_name)
+
+    def get_backup_path(self, batch_id: str, image_name: str) -> str:
+        backup_dir = os.path.join(self.image_dir, '.annotator', 'batches',
+                                  batch_id)
+        backup_name = f'{os.path.splitext(image_name)[0]}.json'
+
+        return os.path.join(backup_dir, backup_name)
+
     def has_annotations(self) -> bool:
         for image_path in self.parent.image_controller.image_paths:
             json_path = self.get_json_path(os.path.basename(image_path))
@@ -70,21 +84,15 @@ class AnnotationController:
         }
 
         for anno in json_content['annotations']:
-            label_schema = LabelSchema(**anno['label_schema'])
-            label_name = label_schema.label_name
+            label_schema = self.label_map.resolve_schema(
+                LabelSchema(**anno['label_schema']))
 
-            if self.label_map.contains(label_name):
-                loaded_schema = self.label_map.get_label_schema(label_name)
-
-                if loaded_schema.kpt_names == label_schema.kpt_names:
-                    label_schema.kpt_symmetry = loaded_schema.kpt_symmetry
+            keypoints = [Keypoint(None, [pos_x, pos_y], visible)
+                         for pos_x, pos_y, visible in anno['keypoints']]
 
             position = anno['position']
-            annotation = Annotation(label_schema, position, ref_id=anno['id'])
-
-            annotation.keypoints = [
-                Keypoint(annotation, [pos_x, pos_y], visible)
-                for pos_x, pos_y, visible in anno['keypoints']]
+            annotation = Annotation(label_schema, position, keypoints,
+                                    ref_id=anno['id'])
 
             if not annotation.has_bbox:
                 annotation.fit_bbox_to_keypoints()
@@ -99,43 +107,141 @@ class AnnotationController:
                          annotations: list[Annotation],
                          append: bool = False
                          ) -> None:
-        annotator_dir = os.path.join(self.image_dir, '.annotator')
+        anno_data = [annotation_to_json(anno) for anno in annotations]
+        self.save_annotation_data(image_name, image_size, anno_data, append)
+
+    def save_annotation_data(self,
+                             image_name: str,
+                             image_size: tuple[int, int],
+                             anno_data: list[dict],
+                             append: bool = False
+                             ) -> None:
+        """Save annotations already converted to JSON. If `append` is set,
+        they are merged into the existing ones, skipping those with the ID
+        or position of an existing annotation."""
         json_path = self.get_json_path(image_name)
 
-        anno_data = []
+        existing_data = []
         if append and os.path.exists(json_path):
             with open(json_path, 'r') as json_file:
-                anno_data = json.load(json_file)['annotations']
+                existing_data = json.load(json_file)['annotations']
+
+        ref_ids = {anno['id'] for anno in existing_data}
+        positions = {_get_position_key(anno) for anno in existing_data}
 
-        pos_data = [anno['position'] for anno in anno_data]
         image_data = {
             'image': {
                 'width': image_size[0],
                 'height': image_size[1]
             },
-            'annotations': anno_data
+            'annotations': existing_data + [
+                anno for anno in anno_data if anno['id'] not in ref_ids
+                and _get_position_key(anno) not in positions]
         }
 
-        for anno in annotations:
-            if anno.position in pos_data:
+        _write_json(json_path, image_data)
+
+    def remove_annotation_data(self,
+                               image_name: str,
+                               ref_ids: set[str]
+                               ) -> None:
+        json_path = self.get_json_path(image_name)
+
+        if not os.path.exists(json_path):
+            return
+
+        with open(json_path, 'r') as json_file:
+            image_data = json.load(json_file)
+
+        anno_data = [anno for anno in image_data['annotations']
+                     if anno['id'] not in ref_ids]
+
+        if len(anno_data) < len(image_data['annotations']):
+            image_data['annotations'] = anno_data
+            _write_json(json_path, image_data)
+
+    def rename_categories(self,
+                          image_name: str,
+                          label_names: dict[str, str | None],
+                          dry_run: bool = False,
+                          backup_path: str = None
+                          ) -> int:
+        """Rename the categories of an image's annotations as mapped by
+        `label_names`, deleting those that map to None. Returns the number
+        of annotations changed, which are only saved if not `dry_run`.
+
+        Annotations renamed to a category of the label map take its schema,
+        keeping the keypoints whose names it shares. If `backup_path` is
+        set, the changed annotations are first saved there along with
+        their index, from which `restore_categories` restores them.
+        """
+        json_path = self.get_json_path(image_name)
+
+        if not os.path.exists(json_path):
+            return 0
+
+        with open(json_path, 'r') as json_file:
+            image_data = json.load(json_file)
+
+        label_schemas = {
+            label_name: self.label_map.get_label_schema(label_name).to_dict()
+            for label_name in set(label_names.values())
+            if label_name is not None and self.label_map.contains(label_name)}
+
+        anno_data, changed_data = [], []
+
+        for index, anno in enumerate(image_data['annotations']):
+            label_name = anno['label_schema']['label_name']
+
+            if label_name not in label_names:
+                anno_data.append(anno)
                 continue
 
-            label_schema = anno.label_schema.to_dict()
-            keypoints = [[keypoint.pos_x,
-                          keypoint.pos_y,
-                          keypoint.visible]
-                         for keypoint in anno.keypoints]
-
-            image_data['annotations'].append({
-                'position': anno.position,
-                'label_schema': label_schema,
-                'keypoints': keypoints,
-                'id': anno.ref_id
-            })
+            target_name = label_names[label_name]
+            renamed_anno = None if target_name is None else _rename_annotation(
+                anno, target_name, label_schemas.get(target_name))
 
-        os.makedirs(annotator_dir, exist_ok=True)
-        with open(json_path, 'w') as json_file:
-            json.dump(image_data, json_file, indent=2)
+            if renamed_anno != anno:
+                changed_data.append([index, anno])
+
+            if renamed_anno is not None:
+                anno_data.append(renamed_anno)
+
+        if changed_data and not dry_run:
+            if backup_path is not None:
+                _write_json(backup_path, {'annotations': changed_data})
+
+            image_data['annotations'] = anno_data
+            _write_json(json_path, image_data)
+
+        return len(changed_data)
+
+    def restore_categories(self, image_name: str, backup_path: str) -> int:
+        """Put back the annotations saved by `rename_categories` at their
+        former index, replacing those with the same ID. Returns the number
+        of annotations restored."""
+        json_path = self.get_json_path(image_name)
+
+        if not (os.path.exists(backup_path) and os.path.exists(json_path)):
+            return 0
+
+        with open(backup_path, 'r') as backup_file:
+            changed_data = json.load(backup_file)['annotations']
+
+        with open(json_path, 'r') as json_file:
+            image_data = json.load(json_file)
+
+        ref_ids = {anno['id'] for _, anno in changed_data}
+        anno_data = [anno for anno in image_data['annotations']
+                     if anno['id'] not in ref_ids]
+
+        for index, anno in changed_data:
+            anno_data.insert(index, anno)
+
+        image_data['annotations'] = anno_data
+        _write_json(json_path, image_data)
+
+        return len(changed_data)
 
     def _import_annotations(self, coco_dataset: dict) -> None:
         annotations = defaultdict(lambda: [])
@@ -231,6 +337,8 @@ class AnnotationController:
         return True
 
     def export_annotations(self, output_path: str) -> bool:
+        from natsort import os_sorted
+
         add_missing_bboxes = self.settings.get(Setting.ADD_MISSING_BBOXES)
         image_paths = self.parent.image_controller.image_paths
 
@@ -318,5 +426,64 @@ class AnnotationController:
         with open(output_path, 'w') as json_file:
             json.dump(export_content, json_file, indent=2)
 
+        # The undo history under `history/` is removed on purpose, as
+        # its actions refer to the annotations that were just exported.
         shutil.rmtree(annotator_dir)
         return True
+
+
+def annotation_to_json(anno: Annotation) -> dict:
+    return {
+        'position': anno.position,
+        'label_schema': anno.label_schema.to_dict(),
+        'keypoints': [[keypoint.pos_x, keypoint.pos_y, keypoint.visible]
+                      for keypoint in anno.keypoints],
+        'id': anno.ref_id
+    }
+
+
+def _get_position_key(anno_data: dict) -> tuple:
+    """Hashable position of an annotation, by which duplicates are found.
+    Annotations without a bbox are compared by their visible keypoints."""
+    if anno_data['position']:
+        return tuple(anno_data['position'])
+
+    return tuple((pos_x, pos_y) for pos_x, pos_y, visible
+                 in anno_data['keypoints'] if visible)
+
+
+def _rename_annotation(anno_data: dict,
+                       label_name: str,
+                       label_schema: dict | None
+                       ) -> dict | None:
+    """Rename an annotation, converting its keypoints to `label_schema` if
+    set. Returns None if nothing of the annotation would be left."""
+    keypoints = anno_data['keypoints']
+
+    if label_schema is None:
+        label_schema = {**anno_data['label_schema'], 'label_name': label_name}
+
+    elif label_schema['kpt_names'] != anno_data['label_schema']['kpt_names']:
+        keypoints_by_name = dict(zip(anno_data['label_schema']['kpt_names'],
+                                     anno_data['keypoints']))
+
+        keypoints = [keypoints_by_name.get(kpt_name, [0, 0, False])
+                     for kpt_name in label_schema['kpt_names']]
+
+    if not (anno_data['position']
+            or any(visible for _, _, visible in keypoints)):
+        return None
+
+    return {**anno_data, 'label_schema': label_schema, 'keypoints': keypoints}
+
+
+def _write_json(json_path: str, content: dict) -> None:
+    """Write to a temporary file first, so that a crash or a concurrent
+    read never sees a partially written file."""
+    os.makedirs(os.path.dirname(json_path), exist_ok=True)
+
+    temp_path = f'{json_path}.tmp'
+    with open(temp_path, 'w') as json_file:
+        json.dump(content, json_file, indent=2)
+
+    os.replace(temp_path, json_path)
@@ -13,6 +13,7 @@ class ButtonController:
         'bbox',
         'keypoints',
         'search_image',
+        'edit_categories',
         'hide_sidebar'
     }
 
@@ -1,21 +1,69 @@
 import glob
 import os
+from array import array
+from bisect import bisect_right
 
-from natsort import os_sorted
 from PyQt6.QtGui import QImageReader
 
 from app.utils import clip_value
 
 
+class ImageSearchIndex:
+    """Substring search over image names, in their original order.
+
+    This is a linear scan, but over a single buffer joining all the names,
+    so that `str.find` runs at C speed instead of a Python loop over every
+    name. The scan stops as soon as enough matches were found, while a
+    query with few matches reads the whole buffer, about 13 ms per
+    million names.
+    """
+
+    separator = '\0'
+
+    def __init__(self, names: list[str] = ()) -> None:
+        self.names = list(names)
+
+        self._buffer = ''.join(name + self.separator for name in self.names)
+        self._offsets = array('Q')
+
+        offset = 0
+        for name in self.names:
+            self._offsets.append(offset)
+            offset += len(name) + len(self.separator)
+
+    def search(self, query: str, limit: int) -> list[int]:
+        if not query:
+            return list(range(min(limit, len(self.names))))
+
+        indices = []
+        position = self._buffer.find(query)
+
+        while position != -1 and len(indices) < limit:
+            index = bisect_right(self._offsets, position) - 1
+            indices.append(index)
+
+            next_offset = self._offsets[index + 1] \
+                if index + 1 < len(self._offsets) else len(self._buffer)
+            position = self._buffer.find(query, next_offset)
+
+        return indices
+
+
 class ImageController:
     def __init__(self) -> None:
         self.image_dir = None
 
         self.image_paths = []
+        self.image_names = []
+        self.image_indices = {}
+        self.search_index = ImageSearchIndex()
+
         self.num_images = 0
         self.index = 0
 
     def load_images(self, image_dir: str) -> None:
+        from natsort import os_sorted
+
         self.image_dir = image_dir
 
         image_paths = []
@@ -28,6 +76,12 @@ class ImageController:
         self.image_paths = os_sorted(image_paths)
         self.num_images = len(self.image_paths)
 
+        self.image_names = [os.path.basename(path)
+                            for path in self.image_paths]
+        self.image_indices = {name: index for index, name
+                              in enumerate(self.image_names)}
+        self.search_index = ImageSearchIndex(self.image_names)
+
     def get_image_path(self) -> str:
         return self.image_paths[self.index]
 
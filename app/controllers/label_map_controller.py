@@ -1,7 +1,10 @@
 import json
 from dataclasses import dataclass, asdict
+from functools import partial
 from typing import TYPE_CHECKING
 
+from PyQt6.QtCore import QThreadPool
+
 from app.enums.settings import Setting
 from app.exceptions.label_map import (
     InvalidJSONException,
@@ -10,10 +13,14 @@ from app.exceptions.label_map import (
     InvalidNamesException,
     LabelNotFoundException
 )
+from app.handlers.search import LabelMatcher
+from app.utils import cache_pretty_text
 
 if TYPE_CHECKING:
     from annotator import MainWindow
 
+__parallel_match_size__ = 4096
+
 
 @dataclass
 class LabelSchema:
@@ -48,6 +55,15 @@ class LabelMapController:
             self._schema_index[label['name']] = LabelSchema(
                 label['name'], kpt_names, kpt_edges, kpt_symmetry)
 
+        # Spell-check the names shown in the UI off the main thread
+        texts = set(self._id_index).union(*(
+            schema.kpt_names for schema in self._schema_index.values()))
+        QThreadPool.globalInstance().start(partial(cache_pretty_text, texts))
+
+        workers = -1 if len(self.labels) >= __parallel_match_size__ else 1
+        self.matcher = LabelMatcher([label['name'] for label in self.labels],
+                                    workers=workers)
+
     def load_labels(self, label_map_path: str) -> None:
         with open(label_map_path, 'r') as json_file:
             try:
@@ -75,8 +91,9 @@ class LabelMapController:
         self.settings.set(Setting.LABEL_MAP, label_map)
         self.settings.set(Setting.HIDDEN_CATEGORIES, [])
 
-        self.parent.settings_window.settings_manager.\
-            setting_hidden_categories.categories.clear()
+        if self.parent.is_loaded('settings_window'):
+            self.parent.settings_window.settings_manager.\
+                setting_hidden_categories.categories.clear()
 
     def get_id(self, label_name: str) -> int:
         if label_name in self._id_index:
@@ -92,3 +109,13 @@ class LabelMapController:
 
     def contains(self, label_name: str) -> bool:
         return label_name in self._id_index
+
+    def resolve_schema(self, label_schema: LabelSchema) -> LabelSchema:
+        """The schema of the label map with the name and keypoints of
+        `label_schema`, or `label_schema` itself if there is none."""
+        loaded_schema = self._schema_index.get(label_schema.label_name)
+
+        if loaded_schema and loaded_schema.kpt_names == label_schema.kpt_names:
+            return loaded_schema
+
+        return label_schema
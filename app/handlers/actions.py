@@ -1,16 +1,41 @@
+import sys
 from abc import ABC, abstractmethod
-from collections import deque, defaultdict, OrderedDict
-from typing import TYPE_CHECKING, Callable
+from array import array
+from collections import defaultdict
+from dataclasses import dataclass, field
+from itertools import accumulate
+from typing import TYPE_CHECKING, Any, Callable
+from uuid import uuid4
 
 from app.controllers.label_map_controller import LabelSchema
 from app.enums.annotation import SelectionType
-from app.enums.canvas import AnnotatingState
-from app.objects import Annotation, Keypoint
+from app.handlers.batch import CategoryJob, PropagationJob
+from app.objects import (
+    Annotation,
+    AnnotationSnapshot,
+    Keypoint,
+    pack_positions,
+    pack_values,
+    unpack_positions
+)
 
 if TYPE_CHECKING:
     from app.canvas import Canvas
 
 
+@dataclass
+class AnnotationDelta:
+    """Reference IDs of the annotations affected by an action."""
+
+    created: set[str] = field(default_factory=set)
+    removed: set[str] = field(default_factory=set)
+    modified: set[str] = field(default_factory=set)
+
+    @property
+    def ref_ids(self) -> set[str]:
+        return self.created | self.removed | self.modified
+
+
 class Action(ABC):
     @abstractmethod
     def do(self) -> None:
@@ -20,48 +45,152 @@ class Action(ABC):
     def undo(self) -> None:
         """Generate and execute the opposite action."""
 
+    @abstractmethod
+    def get_delta(self, undo: bool) -> AnnotationDelta:
+        """Report the annotations affected by `do`, or `undo` if set."""
+
 
 class ActionCreate(Action):
     def __init__(self, parent: 'Canvas', annos: list[Annotation]) -> None:
         self.parent = parent
-        self.annos = annos.copy()
+        self.annos = [AnnotationSnapshot.from_annotation(anno)
+                      for anno in annos]
+
+    @classmethod
+    def from_snapshots(cls,
+                       parent: 'Canvas',
+                       annos: list[AnnotationSnapshot]
+                       ) -> 'ActionCreate':
+        action = cls(parent, [])
+        action.annos = annos
+
+        return action
 
     def do(self) -> None:
         self.parent.unselect_all()
 
-        for anno in self.annos:
-            created_anno = anno.copy()
+        created_annos = [anno.to_annotation() for anno in self.annos]
 
-            self.parent.annotations.append(created_anno)
-            self.parent.add_selected_annotation(created_anno)
+        self.parent.add_annotations(created_annos)
+        self.parent.add_selected_annotations(created_annos)
 
     def undo(self) -> None:
         self.parent.unselect_all()
+        self.parent.remove_annotations([anno.ref_id for anno in self.annos])
+
+    def get_delta(self, undo: bool) -> AnnotationDelta:
+        ref_ids = {anno.ref_id for anno in self.annos}
+
+        return AnnotationDelta(removed=ref_ids) if undo \
+            else AnnotationDelta(created=ref_ids)
+
 
-        self.parent.annotations = list(filter(
-            lambda anno: anno not in self.annos, self.parent.annotations))
+class ActionPropagate(ActionCreate):
+    """Paste the clipboard into a range of images as a single action.
+
+    The annotations pasted into the current image are created as usual,
+    while the files of the other images are updated by a batch job. The
+    job is only started by `do` and `undo`, and runs once they return,
+    with the canvas locked until it is done.
+    """
+
+    def __init__(self,
+                 parent: 'Canvas',
+                 annos: list[AnnotationSnapshot],
+                 anno_data: list[dict],
+                 image_names: list[str]
+                 ) -> None:
+        super().__init__(parent, [])
+
+        self.annos = annos
+        self.anno_data = anno_data
+        self.image_names = image_names
+
+        self.batch_id = uuid4().hex
+
+    def _propagate(self, remove: bool) -> None:
+        self.parent.batch_handler.start(PropagationJob(
+            self.image_names, self.batch_id, self.anno_data, remove))
+
+    def do(self) -> None:
+        super().do()
+        self._propagate(remove=False)
+
+    def undo(self) -> None:
+        super().undo()
+        self._propagate(remove=True)
+
+
+class ActionEditCategories(Action):
+    """Rename, merge or delete categories in the files of all images.
+
+    The files are updated by a batch job, which backs up the annotations
+    it changes, and `undo` restores them by another. The job runs once
+    `do` or `undo` returns, after which the current image is reloaded.
+    The history of the other images changed is discarded, as replaying it
+    would undo part of the edit.
+    """
+
+    def __init__(self,
+                 parent: 'Canvas',
+                 label_names: dict[str, str | None],
+                 image_names: list[str]
+                 ) -> None:
+        self.parent = parent
+        self.label_names = label_names
+        self.image_names = image_names
+
+        self.batch_id = uuid4().hex
+
+    def _edit(self, restore: bool) -> None:
+        self.parent.save_progress()
+
+        self.parent.batch_handler.start(
+            CategoryJob(self.image_names, self.label_names,
+                        batch_id=self.batch_id, restore=restore),
+            self._on_edited)
+
+    def _on_edited(self, _: CategoryJob, changes: dict[str, int]) -> None:
+        self.parent.action_handler.clear_history(
+            [name for name in changes if name != self.parent.image_name])
+
+        self.parent.parent.reload()
+
+    def do(self) -> None:
+        self._edit(restore=False)
+
+    def undo(self) -> None:
+        self._edit(restore=True)
+
+    def get_delta(self, undo: bool) -> AnnotationDelta:
+        # The annotation list is redrawn once the image is reloaded
+        return AnnotationDelta()
 
 
 class ActionDelete(Action):
     def __init__(self, parent: 'Canvas', annos: list[Annotation]) -> None:
         self.parent = parent
-        self.annos = {anno.ref_id: anno.copy() for anno in annos}
+        self.annos = {anno.ref_id: AnnotationSnapshot.from_annotation(anno)
+                      for anno in annos}
 
     def do(self) -> None:
         self.parent.unselect_all()
-
-        self.parent.annotations = [anno for anno in self.parent.annotations
-                                   if anno.ref_id not in self.annos]
+        self.parent.remove_annotations(self.annos)
 
     def undo(self) -> None:
         self.parent.unselect_all()
 
-        for anno in self.annos.values():
-            if anno in self.parent.annotations:
-                self.parent.annotations.remove(anno)
+        restored_annos = [anno.to_annotation()
+                          for anno in self.annos.values()]
 
-            self.parent.annotations.append(anno.copy())
-            self.parent.add_selected_annotation(anno)
+        self.parent.add_annotations(restored_annos)
+        self.parent.add_selected_annotations(restored_annos)
+
+    def get_delta(self, undo: bool) -> AnnotationDelta:
+        ref_ids = set(self.annos)
+
+        return AnnotationDelta(created=ref_ids) if undo \
+            else AnnotationDelta(removed=ref_ids)
 
 
 class ActionRename(Action):
@@ -78,10 +207,12 @@ class ActionRename(Action):
     def _execute(self, get_target_schema: Callable) -> None:
         self.parent.unselect_all()
 
-        for anno in self.parent.annotations.copy():
-            if anno.ref_id in self.schemas_from:
-                anno.set_schema(get_target_schema(anno.ref_id))
-                self.parent.add_selected_annotation(anno)
+        annos = self.parent.get_annotations(self.schemas_from)
+
+        for anno in annos:
+            anno.set_schema(get_target_schema(anno.ref_id))
+
+        self.parent.add_selected_annotations(annos)
 
     def do(self) -> None:
         self._execute(lambda _: self.schema_to)
@@ -89,6 +220,9 @@ class ActionRename(Action):
     def undo(self) -> None:
         self._execute(lambda ref_id: self.schemas_from[ref_id])
 
+    def get_delta(self, undo: bool) -> AnnotationDelta:
+        return AnnotationDelta(modified=set(self.schemas_from))
+
 
 class ActionMove(Action):
     def __init__(self,
@@ -100,36 +234,38 @@ class ActionMove(Action):
         self.parent = parent
         self.ref_id = anno.ref_id
 
-        self.pos_from_anno = pos_from_anno
-        self.pos_from_kpts = pos_from_kpts
+        self.pos_from_anno = pack_values(pos_from_anno)
+        self.pos_from_kpts = pack_positions(pos_from_kpts or [])
 
-        self.pos_to_anno = anno.position or anno.implicit_bbox
-        self.pos_to_kpts = [kpt.position for kpt in anno.keypoints]
+        self.pos_to_anno = pack_values(anno.position or anno.implicit_bbox)
+        self.pos_to_kpts = pack_positions(
+            kpt.position for kpt in anno.keypoints)
 
-    def _execute(self,
-                 pos_anno: list[int, ...],
-                 pos_kpts: list[list[int, int]]
-                 ) -> None:
+    def _execute(self, pos_anno: array, pos_kpts: array) -> None:
         x_min, y_min, x_max, y_max = pos_anno
 
-        for anno in self.parent.annotations.copy():
-            if anno.ref_id == self.ref_id:
-                if anno.has_bbox:
-                    anno.position = [min(x_min, x_max), min(y_min, y_max),
-                                     max(x_min, x_max), max(y_min, y_max)]
-                else:
-                    anno.implicit_bbox = [min(x_min, x_max), min(y_min, y_max),
-                                          max(x_min, x_max), max(y_min, y_max)]
+        anno = self.parent.get_annotation(self.ref_id)
+        if anno is None:
+            return
 
-                if pos_kpts:
-                    for keypoint, pos in zip(anno.keypoints, pos_kpts):
-                        keypoint.position = pos.copy()
+        if anno.has_bbox:
+            anno.position = [min(x_min, x_max), min(y_min, y_max),
+                             max(x_min, x_max), max(y_min, y_max)]
+        else:
+            anno.implicit_bbox = [min(x_min, x_max), min(y_min, y_max),
+                                  max(x_min, x_max), max(y_min, y_max)]
 
-                if not anno.selected:
-                    self.parent.set_selected_annotation(anno)
+        if pos_kpts:
+            for keypoint, pos in zip(anno.keypoints,
+                                     unpack_positions(pos_kpts)):
+                keypoint.position = pos
 
-            else:
-                self.parent.unselect_annotation(anno)
+        if not anno.selected:
+            self.parent.set_selected_annotation(anno)
+
+        for selected_anno in self.parent.selected_annos.copy():
+            if selected_anno is not anno:
+                self.parent.unselect_annotation(selected_anno)
 
     def do(self) -> None:
         self._execute(self.pos_to_anno, self.pos_to_kpts)
@@ -137,6 +273,70 @@ class ActionMove(Action):
     def undo(self) -> None:
         self._execute(self.pos_from_anno, self.pos_from_kpts)
 
+    def get_delta(self, undo: bool) -> AnnotationDelta:
+        return AnnotationDelta(modified={self.ref_id})
+
+
+class ActionMoveSelection(Action):
+    def __init__(self,
+                 parent: 'Canvas',
+                 annos: list[Annotation],
+                 pos_from_annos: list[list[int, ...]],
+                 pos_from_kpts: list[list[int, int]]
+                 ) -> None:
+        self.parent = parent
+        self.ref_ids = [anno.ref_id for anno in annos]
+
+        # The keypoints of all annotations are packed together, the offsets
+        # mark where those of each annotation start
+        self.kpt_offsets = array('q', accumulate(
+            (len(anno.keypoints) for anno in annos), initial=0))
+
+        self.pos_from_annos = pack_positions(pos_from_annos)
+        self.pos_from_kpts = pack_positions(pos_from_kpts)
+
+        self.pos_to_annos = pack_positions(
+            anno.position or anno.implicit_bbox for anno in annos)
+        self.pos_to_kpts = pack_positions(
+            kpt.position for anno in annos for kpt in anno.keypoints)
+
+    def _execute(self, pos_annos: array, pos_kpts: array) -> None:
+        self.parent.unselect_all()
+
+        boxes = pos_annos.tolist()
+        keypoints = unpack_positions(pos_kpts)
+
+        moved_annos = []
+
+        for index, ref_id in enumerate(self.ref_ids):
+            anno = self.parent.get_annotation(ref_id)
+            if anno is None:
+                continue
+
+            box = boxes[4 * index:4 * index + 4]
+
+            if anno.has_bbox:
+                anno.position = box
+            else:
+                anno.implicit_bbox = box
+
+            start, end = self.kpt_offsets[index], self.kpt_offsets[index + 1]
+            for keypoint, pos in zip(anno.keypoints, keypoints[start:end]):
+                keypoint.position = pos
+
+            moved_annos.append(anno)
+
+        self.parent.add_selected_annotations(moved_annos)
+
+    def do(self) -> None:
+        self._execute(self.pos_to_annos, self.pos_to_kpts)
+
+    def undo(self) -> None:
+        self._execute(self.pos_from_annos, self.pos_from_kpts)
+
+    def get_delta(self, undo: bool) -> AnnotationDelta:
+        return AnnotationDelta(modified=set(self.ref_ids))
+
 
 class ActionAddBbox(Action):
     def __init__(self, parent: 'Canvas', annos: list[Annotation]) -> None:
@@ -146,49 +346,61 @@ class ActionAddBbox(Action):
     def do(self) -> None:
         self.parent.unselect_all()
 
-        for anno in self.parent.annotations.copy():
-            if anno.ref_id in self.ref_ids:
-                anno.position = anno.implicit_bbox.copy()
-                anno.has_bbox = True
+        annos = self.parent.get_annotations(self.ref_ids)
+
+        for anno in annos:
+            anno.position = anno.implicit_bbox.copy()
+            anno.has_bbox = True
 
-                self.parent.add_selected_annotation(anno)
+        self.parent.add_selected_annotations(annos)
 
     def undo(self) -> None:
         self.parent.unselect_all()
 
-        for anno in self.parent.annotations.copy():
-            if anno.ref_id in self.ref_ids:
-                anno.position = []
-                anno.has_bbox = False
+        annos = self.parent.get_annotations(self.ref_ids)
+
+        for anno in annos:
+            anno.position = []
+            anno.has_bbox = False
 
-                self.parent.add_selected_annotation(anno)
+        self.parent.add_selected_annotations(annos)
+
+    def get_delta(self, undo: bool) -> AnnotationDelta:
+        return AnnotationDelta(modified=self.ref_ids)
 
 
 class ActionDeleteBbox(Action):
     def __init__(self, parent: 'Canvas', annos: list[Annotation]) -> None:
         self.parent = parent
-        self.annos = {anno.ref_id: anno.copy() for anno in annos}
+        self.positions = {anno.ref_id: pack_values(anno.position)
+                          for anno in annos}
 
     def do(self) -> None:
         self.parent.unselect_all()
 
-        for anno in self.parent.annotations.copy():
-            if anno.ref_id in self.annos:
-                anno.position = []
-                anno.has_bbox = False
-                anno.fit_bbox_to_keypoints()
+        for anno in self.parent.get_annotations(self.positions):
+            anno.position = []
+            anno.has_bbox = False
+            anno.fit_bbox_to_keypoints()
 
     def undo(self) -> None:
         self.parent.unselect_all()
 
-        for anno in self.parent.annotations.copy():
-            if anno.ref_id in self.annos:
-                anno.position = self.annos[anno.ref_id].position.copy()
-                anno.has_bbox = True
+        annos = self.parent.get_annotations(self.positions)
+
+        for anno in annos:
+            anno.position = self.positions[anno.ref_id].tolist()
+            anno.has_bbox = True
 
-                self.parent.add_selected_annotation(anno)
+        self.parent.add_selected_annotations(annos)
+
+        for anno in annos:
+            if anno.selected:
                 anno.selected = SelectionType.BOX_ONLY
 
+    def get_delta(self, undo: bool) -> AnnotationDelta:
+        return AnnotationDelta(modified=set(self.positions))
+
 
 class ActionCreateKeypoints(Action):
     def __init__(self, parent: 'Canvas', keypoints: list[Keypoint]) -> None:
@@ -196,21 +408,23 @@ class ActionCreateKeypoints(Action):
         self.parent = parent
 
         for keypoint in keypoints:
-            keypoint_info = keypoint.index, keypoint.position
+            keypoint_info = keypoint.index, pack_values(keypoint.position)
             self.keypoints[keypoint.parent.ref_id].append(keypoint_info)
 
-        self.annotations = {kpt.parent.ref_id: kpt.parent.copy()
-                            for kpt in keypoints}
+        self.keypoints = dict(self.keypoints)
+
+        # Annotations without a bbox are removed along with their last
+        # keypoint, these are restored from a snapshot
+        self.annotations = {
+            kpt.parent.ref_id: AnnotationSnapshot.from_annotation(kpt.parent)
+            for kpt in keypoints if not kpt.parent.has_bbox}
 
     def _execute(self, visible: bool) -> None:
         self.parent.unselect_all()
 
-        for anno in self.parent.annotations:
-            if anno.ref_id not in self.keypoints:
-                continue
-
+        for anno in self.parent.get_annotations(self.keypoints):
             for index, position in self.keypoints[anno.ref_id]:
-                anno.keypoints[index].position = position.copy()
+                anno.keypoints[index].position = position.tolist()
                 anno.keypoints[index].visible = visible
 
                 if visible:
@@ -221,12 +435,13 @@ class ActionCreateKeypoints(Action):
                     anno.fit_bbox_to_keypoints()
 
                 else:
-                    self.parent.annotations = list(
-                        filter(lambda a: a != anno, self.parent.annotations))
+                    self.parent.remove_annotations([anno.ref_id])
 
-        for anno in self.annotations.values():
-            if visible and anno not in self.parent.annotations:
-                self.parent.annotations.append(anno.copy())
+        if visible:
+            self.parent.add_annotations([
+                anno.to_annotation() for ref_id, anno in
+                self.annotations.items()
+                if self.parent.get_annotation(ref_id) is None])
 
     def do(self) -> None:
         self._execute(True)
@@ -234,6 +449,11 @@ class ActionCreateKeypoints(Action):
     def undo(self) -> None:
         self._execute(False)
 
+    def get_delta(self, undo: bool) -> AnnotationDelta:
+        # Annotations without a bbox are created or removed along with
+        # their keypoints, the sidebar resolves which one it was
+        return AnnotationDelta(modified=set(self.keypoints))
+
 
 class ActionDeleteKeypoints(ActionCreateKeypoints):
     def do(self) -> None:
@@ -252,19 +472,21 @@ class ActionMoveKeypoint(Action):
         self.parent = parent
         self.ref_id = keypoint.parent.ref_id
 
-        self.pos_from = pos_from
-        self.pos_to = keypoint.position
+        self.pos_from = pack_values(pos_from)
+        self.pos_to = pack_values(keypoint.position)
         self.index = keypoint.index
 
-    def _execute(self, pos: list[int, int]) -> None:
-        for anno in self.parent.annotations:
-            if anno.ref_id == self.ref_id:
-                keypoint = anno.keypoints[self.index]
+    def _execute(self, pos: array) -> None:
+        anno = self.parent.get_annotation(self.ref_id)
+        if anno is None:
+            return
 
-                keypoint.position = pos
-                self.parent.set_selected_keypoint(keypoint)
+        keypoint = anno.keypoints[self.index]
 
-                anno.fit_bbox_to_keypoints()
+        keypoint.position = pos.tolist()
+        self.parent.set_selected_keypoint(keypoint)
+
+        anno.fit_bbox_to_keypoints()
 
     def do(self) -> None:
         self._execute(self.pos_to)
@@ -272,6 +494,9 @@ class ActionMoveKeypoint(Action):
     def undo(self) -> None:
         self._execute(self.pos_from)
 
+    def get_delta(self, undo: bool) -> AnnotationDelta:
+        return AnnotationDelta(modified={self.ref_id})
+
 
 class ActionFlipKeypoints(Action):
     def __init__(self, parent: 'Canvas',  anno: Annotation) -> None:
@@ -279,21 +504,21 @@ class ActionFlipKeypoints(Action):
         self.ref_id = anno.ref_id
 
     def _execute(self) -> None:
-        for anno in self.parent.annotations.copy():
-            if anno.ref_id != self.ref_id:
-                continue
+        anno = self.parent.get_annotation(self.ref_id)
+        if anno is None:
+            return
 
-            for index_left, index_right in anno.label_schema.kpt_symmetry:
-                keypoint_left = anno.keypoints[index_left - 1]
-                keypoint_right = anno.keypoints[index_right - 1]
+        for index_left, index_right in anno.label_schema.kpt_symmetry:
+            keypoint_left = anno.keypoints[index_left - 1]
+            keypoint_right = anno.keypoints[index_right - 1]
 
-                keypoint_left.visible, keypoint_right.visible = \
-                    keypoint_right.visible, keypoint_left.visible
+            keypoint_left.visible, keypoint_right.visible = \
+                keypoint_right.visible, keypoint_left.visible
 
-                keypoint_left.position, keypoint_right.position = \
-                    keypoint_right.position, keypoint_left.position
+            keypoint_left.position, keypoint_right.position = \
+                keypoint_right.position, keypoint_left.position
 
-            self.parent.set_selected_annotation(anno)
+        self.parent.set_selected_annotation(anno)
 
     def do(self) -> None:
         self._execute()
@@ -301,70 +526,35 @@ class ActionFlipKeypoints(Action):
     def undo(self) -> None:
         self._execute()
 
+    def get_delta(self, undo: bool) -> AnnotationDelta:
+        return AnnotationDelta(modified={self.ref_id})
 
-class ActionHandler:
-    def __init__(self, parent: 'Canvas', image_name: str | None) -> None:
-        self.parent = parent
-        self.image_name = image_name
-
-        self.action_cache = LRUActionCache(max_images=50, max_actions=50)
-
-    def _execute(self, undo: bool) -> Action | None:
-        if self.image_name not in self.action_cache:
-            return None
-
-        self.parent.set_annotating_state(AnnotatingState.IDLE)
-        self.action_cache.move_to_end(self.image_name)
-        stacks = self.action_cache[self.image_name]
-
-        stack_from, stack_to = (stacks['undo'], stacks['redo']) \
-            if undo else (stacks['redo'], stacks['undo'])
-
-        if len(stack_from) == 0:
-            return None
-
-        action = stack_from.pop()
-        stack_to.append(action)
-
-        action.undo() if undo else action.do()
 
-        self.parent.parent.annotation_list.redraw_widgets()
-        self.parent.unsaved_changes = True
-        self.parent.update()
+def get_action_size(action: Action) -> int:
+    """Approximate memory held by an action, in bytes."""
+    return sys.getsizeof(action) + sum(
+        _get_size(value) for name, value in vars(action).items()
+        if name != 'parent')
 
-        return action
-
-    def undo(self) -> Action | None:
-        return self._execute(undo=True)
-
-    def redo(self) -> Action | None:
-        return self._execute(undo=False)
-
-    def register_action(self, action: Action) -> None:
-        self.action_cache.add_image(self.image_name)
 
-        self.action_cache[self.image_name]['redo'].clear()
-        self.action_cache[self.image_name]['redo'].append(action)
+def _get_size(value: Any) -> int:
+    """Approximate memory held by the containers and packed values of an
+    action. Reference IDs and label schemas are shared with the canvas and
+    the label map, so they are not counted."""
+    if isinstance(value, (str, LabelSchema)):
+        return 0
 
-        self._execute(undo=False)
+    size = sys.getsizeof(value)
 
+    if isinstance(value, dict):
+        size += sum(_get_size(key) + _get_size(item)
+                    for key, item in value.items())
 
-class LRUActionCache(OrderedDict):
-    def __init__(self, max_images: int, max_actions: int) -> None:
-        super().__init__()
+    elif isinstance(value, (list, tuple, set)):
+        size += sum(_get_size(item) for item in value)
 
-        self.max_images = max_images
-        self.max_actions = max_actions
-
-    def add_image(self, image_name: str) -> None:
-        if image_name in self:
-            self.move_to_end(image_name)
-
-        else:
-            if len(self) == self.max_images:
-                self.popitem(last=False)
+    elif isinstance(value, AnnotationSnapshot):
+        size += sum(_get_size(getattr(value, name))
+                    for name in value.__slots__)
 
-            self[image_name] = {
-                'undo': deque(maxlen=self.max_actions),
-                'redo': deque(maxlen=self.max_actions)
-            }
+    return size
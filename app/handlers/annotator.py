@@ -6,6 +6,7 @@ from PyQt6.QtWidgets import QWidget, QHBoxLayout, QLabel
 
 from app.enums.canvas import AnnotatingState
 from app.objects import Annotation
+from app.styles.style_sheets import set_style_property
 from app.utils import clip_value, pretty_text
 
 if TYPE_CHECKING:
@@ -16,11 +17,6 @@ __styled_background__ = Qt.WidgetAttribute.WA_StyledBackground
 
 
 class KeypointAnnotator:
-    color_left = 57, 109, 191
-    color_right = 153, 46, 46
-    color_default = 220, 220, 220
-    color_disabled = 100, 100, 100
-
     def __init__(self, canvas: 'Canvas') -> None:
         super().__init__()
         self.canvas = canvas
@@ -33,7 +29,7 @@ class KeypointAnnotator:
 
         self.label_index = 0
         self.kpt_names = []
-        self.colors = []
+        self.kpt_sides = []
 
         self.created_keypoints = []
 
@@ -45,10 +41,10 @@ class KeypointAnnotator:
         self.label_index = 0
         self.active = True
 
-        self.colors = [self.color_default] * len(self.kpt_names)
+        self.kpt_sides = ['center'] * len(self.kpt_names)
         for left, right in annotation.label_schema.kpt_symmetry:
-            self.colors[left - 1] = self.color_left
-            self.colors[right - 1] = self.color_right
+            self.kpt_sides[left - 1] = 'left'
+            self.kpt_sides[right - 1] = 'right'
 
         text_width = (self.keypoint_label.font_metrics.horizontalAdvance(
             pretty_text(kpt_name)) for kpt_name in self.kpt_names)
@@ -59,7 +55,7 @@ class KeypointAnnotator:
 
         self.canvas.set_selected_annotation(annotation)
 
-        if annotation not in self.canvas.annotations:
+        if not self.canvas.contains_annotation(annotation):
             self.canvas.parent.annotation_list.redraw_widgets()
 
         self.update()
@@ -78,8 +74,8 @@ class KeypointAnnotator:
         keypoint = self.annotation.keypoints[self.label_index]
 
         self.keypoint_label.set_text(self.kpt_names[self.label_index])
-        self.keypoint_label.set_color(self.color_disabled if keypoint.visible
-                                      else self.colors[self.label_index])
+        self.keypoint_label.set_state('placed' if keypoint.visible
+                                      else self.kpt_sides[self.label_index])
 
         self.keypoint_label.set_enabled_prev(self.label_index > 0)
         self.keypoint_label.set_enabled_next(self.label_index < max_index)
@@ -118,6 +114,7 @@ class KeypointAnnotator:
         self.created_keypoints.append(keypoint)
         keypoint.position = list(mouse_pos)
         keypoint.visible = True
+        self.canvas.invalidate_geometry()
 
         if keypoint == self.annotation.keypoints[-1]:
             self.end()
@@ -148,9 +145,6 @@ class KeypointAnnotator:
 
 
 class KeypointLabel(QWidget):
-    color_enabled = 220, 220, 220
-    color_disabled = 100, 100, 100
-
     def __init__(self, canvas: 'Canvas') -> None:
         super().__init__(canvas)
 
@@ -165,6 +159,10 @@ class KeypointLabel(QWidget):
             layout.addWidget(label)
 
         self.text_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        font = self.text_label.font()
+        font.setBold(True)
+
+        self.text_label.setFont(font)
         self.font_metrics = self.text_label.fontMetrics()
 
         self.setAttribute(__mouse_events__, True)
@@ -179,16 +177,11 @@ class KeypointLabel(QWidget):
     def set_text(self, text: str) -> None:
         self.text_label.setText(pretty_text(text))
 
-    def set_color(self, color: tuple[int, ...]) -> None:
-        self.text_label.setStyleSheet(f'''
-            color: rgb{color};
-            font-weight: bold;
-        ''')
+    def set_state(self, state: str) -> None:
+        set_style_property(self.text_label, 'state', state)
 
     def set_enabled_next(self, enabled: bool) -> None:
-        color = self.color_enabled if enabled else self.color_disabled
-        self.right_arrow.setStyleSheet(f'color: rgb{color};')
+        set_style_property(self.right_arrow, 'active', enabled)
 
     def set_enabled_prev(self, enabled: bool) -> None:
-        color = self.color_enabled if enabled else self.color_disabled
-        self.left_arrow.setStyleSheet(f'color: rgb{color};')
+        set_style_property(self.left_arrow, 'active', enabled)
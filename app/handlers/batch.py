@@ -0,0 +1,276 @@
+import hashlib
+import os
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Callable
+
+from PyQt6.QtCore import (
+    Qt,
+    QObject,
+    QRunnable,
+    QThreadPool,
+    pyqtSignal
+)
+from PyQt6.QtGui import QImageReader
+from PyQt6.QtWidgets import QProgressDialog
+
+if TYPE_CHECKING:
+    from app.canvas import Canvas
+    from app.controllers.annotation_controller import AnnotationController
+
+__chunk_size__ = 16
+
+
+@dataclass
+class BatchJob(ABC):
+    """Work on the annotation files of many images, one at a time."""
+
+    image_names: list[str]
+    cancelled: bool = field(default=False, init=False)
+
+    @property
+    @abstractmethod
+    def description(self) -> str:
+        """Text shown while the job is running."""
+
+    @abstractmethod
+    def process(self,
+                controller: 'AnnotationController',
+                image_name: str
+                ) -> Any:
+        """Update the annotation file of `image_name`, returning a result
+        to report for it, if any."""
+
+
+@dataclass
+class PropagationJob(BatchJob):
+    """Annotations to add to, or remove from, the files of other images.
+
+    The annotations added to an image get reference IDs derived from the
+    batch ID, the image name and their index, so that removing them only
+    requires the same three values.
+    """
+
+    batch_id: str
+    anno_data: list[dict]
+    remove: bool = False
+
+    @property
+    def description(self) -> str:
+        return 'Removing propagated annotations...' if self.remove \
+            else 'Propagating annotations...'
+
+    def get_ref_ids(self, image_name: str) -> list[str]:
+        return [get_propagated_id(self.batch_id, image_name, index)
+                for index in range(len(self.anno_data))]
+
+    def process(self,
+                controller: 'AnnotationController',
+                image_name: str
+                ) -> None:
+        if self.remove:
+            controller.remove_annotation_data(
+                image_name, set(self.get_ref_ids(image_name)))
+
+            return
+
+        image_path = os.path.join(controller.image_dir, image_name)
+        image_size = QImageReader(image_path).size()
+
+        if not image_size.isValid():
+            return
+
+        ref_ids = self.get_ref_ids(image_name)
+        anno_data = [{**anno, 'id': ref_id}
+                     for anno, ref_id in zip(self.anno_data, ref_ids)]
+
+        controller.save_annotation_data(
+            image_name,
+            (image_size.width(), image_size.height()),
+            anno_data,
+            append=True)
+
+
+@dataclass
+class CategoryJob(BatchJob):
+    """Renames, merges or deletes categories in the files of all images.
+
+    Each category in `label_names` is renamed to the name it maps to, or
+    deleted if it maps to None. A dry run only counts the annotations that
+    would change. Otherwise the changed annotations are backed up under
+    the batch ID, and restored from there by a job with `restore` set.
+    """
+
+    label_names: dict[str, str | None]
+    dry_run: bool = False
+    batch_id: str | None = None
+    restore: bool = False
+
+    @property
+    def description(self) -> str:
+        if self.dry_run:
+            return 'Counting annotations...'
+
+        return 'Restoring categories...' if self.restore \
+            else 'Updating categories...'
+
+    def process(self,
+                controller: 'AnnotationController',
+                image_name: str
+                ) -> int:
+        backup_path = None if self.batch_id is None \
+            else controller.get_backup_path(self.batch_id, image_name)
+
+        if self.restore:
+            return controller.restore_categories(image_name, backup_path)
+
+        return controller.rename_categories(
+            image_name, self.label_names, self.dry_run, backup_path)
+
+
+class BatchSignals(QObject):
+    progress = pyqtSignal(object)
+    finished = pyqtSignal(object, dict)
+
+
+class BatchWorker(QRunnable):
+    """Runs a job on a chunk of its images, reporting progress after each
+    one and the results once the chunk is done."""
+
+    def __init__(self,
+                 job: BatchJob,
+                 image_names: list[str],
+                 controller: 'AnnotationController',
+                 signals: BatchSignals
+                 ) -> None:
+        super().__init__()
+
+        self.job = job
+        self.image_names = image_names
+        self.controller = controller
+        self.signals = signals
+
+    def run(self) -> None:
+        results = {}
+
+        for image_name in self.image_names:
+            if self.job.cancelled:
+                break
+
+            try:
+                result = self.job.process(self.controller, image_name)
+
+                if result:
+                    results[image_name] = result
+
+            # Leave files that can't be read or written as they are
+            except (OSError, ValueError, KeyError, TypeError):
+                pass
+
+            self.signals.progress.emit(self.job)
+
+        self.signals.finished.emit(self.job, results)
+
+
+class BatchHandler:
+    """Runs batch jobs on the thread pool, showing their progress.
+
+    Jobs run without blocking the event loop. The progress dialog is
+    modal, and actions and image changes are ignored while `running`, so
+    that the images can't be opened or changed while their files are
+    being written.
+    """
+
+    def __init__(self, parent: 'Canvas') -> None:
+        self.parent = parent
+
+        self.signals = BatchSignals()
+        self.signals.progress.connect(self._on_progress)
+        self.signals.finished.connect(self._on_finished)
+
+        self._job = None
+        self._on_done = None
+        self._progress = 0
+        self._running = 0
+        self._results = {}
+
+        self._dialog = None
+
+    @property
+    def running(self) -> bool:
+        return self._job is not None
+
+    def start(self,
+              job: BatchJob,
+              on_done: Callable[[BatchJob, dict[str, Any]], None] = None
+              ) -> None:
+        """Start `job`, calling `on_done` with the results reported for
+        each image once all of its workers have stopped. A job started
+        while another one is running is cancelled straight away."""
+        if self.running:
+            job.cancelled = True
+            return
+
+        controller = self.parent.parent.annotation_controller
+
+        chunks = [job.image_names[index:index + __chunk_size__]
+                  for index in range(0, len(job.image_names), __chunk_size__)]
+
+        if not chunks:
+            if on_done is not None:
+                on_done(job, {})
+
+            return
+
+        self._dialog = QProgressDialog(job.description, 'Cancel', 0,
+                                       len(job.image_names), self.parent)
+        self._dialog.setWindowModality(Qt.WindowModality.ApplicationModal)
+        self._dialog.setMinimumDuration(0)
+        self._dialog.canceled.connect(self._cancel)
+        self._dialog.show()
+
+        self._job, self._on_done = job, on_done
+        self._progress, self._running = 0, len(chunks)
+        self._results = {}
+
+        for chunk in chunks:
+            QThreadPool.globalInstance().start(
+                BatchWorker(job, chunk, controller, self.signals))
+
+    def _cancel(self) -> None:
+        if self._job is not None:
+            self._job.cancelled = True
+
+    def _on_progress(self, job: BatchJob) -> None:
+        if job is not self._job:
+            return
+
+        self._progress += 1
+
+        if not job.cancelled:
+            self._dialog.setValue(self._progress)
+
+    def _on_finished(self, job: BatchJob, results: dict[str, Any]) -> None:
+        if job is not self._job:
+            return
+
+        self._results.update(results)
+        self._running -= 1
+
+        if self._running > 0:
+            return
+
+        on_done, results, dialog = self._on_done, self._results, self._dialog
+        self._job, self._on_done, self._dialog = None, None, None
+
+        # Closing the dialog emits `canceled`, so the job is released first
+        dialog.close()
+        dialog.deleteLater()
+
+        if on_done is not None:
+            on_done(job, results)
+
+
+def get_propagated_id(batch_id: str, image_name: str, index: int) -> str:
+    key = f'{batch_id}/{image_name}/{index}'.encode('utf-8')
+    return hashlib.blake2b(key, digest_size=16).hexdigest()
@@ -0,0 +1,66 @@
+from itertools import chain
+
+import numpy as np
+
+from app.objects import Annotation
+
+__empty_box__ = (np.nan,) * 4
+
+
+class AnnotationGeometry:
+    """Coordinates of the annotations of an image, packed into arrays.
+
+    Boxes are held as a 4 x N array, keypoints as a flat 2 x M array along
+    with the index of the annotation each belongs to, since label schemas
+    differ in their number of keypoints. The canvas rebuilds it once the
+    annotations change, and uses it to find those under the cursor.
+    """
+
+    def __init__(self, annotations: list[Annotation]) -> None:
+        self.annotations = annotations
+
+        keypoints = [kpt for anno in annotations for kpt in anno.keypoints]
+
+        self.boxes = np.fromiter(chain.from_iterable(
+            anno.position or anno.implicit_bbox or __empty_box__
+            for anno in annotations), float, 4 * len(annotations))
+        self.boxes = self.boxes.reshape(-1, 4).T.copy()
+
+        self.has_bbox = np.fromiter(
+            (anno.has_bbox for anno in annotations), bool, len(annotations))
+
+        self.kpts = np.fromiter(chain.from_iterable(
+            kpt.position for kpt in keypoints), float, 2 * len(keypoints))
+        self.kpts = self.kpts.reshape(-1, 2).T.copy()
+
+        self.kpts_visible = np.fromiter(
+            (kpt.visible for kpt in keypoints), bool, len(keypoints))
+        self.kpts_owner = np.repeat(
+            np.arange(len(annotations)),
+            [len(anno.keypoints) for anno in annotations])
+
+    def get_candidates(self,
+                       margin: float,
+                       mouse_pos: tuple[float, float]
+                       ) -> list[Annotation]:
+        """Annotations that may be hovered at `mouse_pos`, front to back.
+
+        These are the annotations whose bbox, widened by `margin` unless
+        implicit, or any visible keypoint is within reach of the cursor.
+        """
+        pos_x, pos_y = mouse_pos
+        x_min, y_min, x_max, y_max = self.boxes
+        kpts_x, kpts_y = self.kpts
+
+        padding = self.has_bbox * margin
+
+        hovered = (x_min - padding <= pos_x) & (pos_x <= x_max + padding) \
+            & (y_min - padding <= pos_y) & (pos_y <= y_max + padding)
+
+        hovered_kpts = self.kpts_visible \
+            & (np.abs(kpts_x - pos_x) <= margin) \
+            & (np.abs(kpts_y - pos_y) <= margin)
+        hovered[self.kpts_owner[hovered_kpts]] = True
+
+        return [self.annotations[index]
+                for index in np.flatnonzero(hovered)[::-1]]
@@ -0,0 +1,430 @@
+import json
+import os
+from array import array
+from collections import deque, OrderedDict
+from typing import TYPE_CHECKING, Any
+
+from app.controllers.label_map_controller import LabelSchema
+from app.enums.canvas import AnnotatingState
+from app.handlers.actions import (
+    Action,
+    ActionAddBbox,
+    ActionCreate,
+    ActionCreateKeypoints,
+    ActionDelete,
+    ActionDeleteBbox,
+    ActionDeleteKeypoints,
+    ActionEditCategories,
+    ActionFlipKeypoints,
+    ActionMove,
+    ActionMoveKeypoint,
+    ActionMoveSelection,
+    ActionPropagate,
+    ActionRename,
+    get_action_size
+)
+from app.objects import AnnotationSnapshot
+
+if TYPE_CHECKING:
+    from app.canvas import Canvas
+
+__version__ = 1
+__history_size__ = 64 * 1024 * 1024
+__min_compaction_size__ = 256
+
+__actions__ = {action.__name__: action for action in (
+    ActionAddBbox,
+    ActionCreate,
+    ActionCreateKeypoints,
+    ActionDelete,
+    ActionDeleteBbox,
+    ActionDeleteKeypoints,
+    ActionEditCategories,
+    ActionFlipKeypoints,
+    ActionMove,
+    ActionMoveKeypoint,
+    ActionMoveSelection,
+    ActionPropagate,
+    ActionRename
+)}
+
+
+class ActionHandler:
+    def __init__(self, parent: 'Canvas', image_name: str | None) -> None:
+        self.parent = parent
+        self.image_name = image_name
+
+        self.action_cache = LRUActionCache(max_size=__history_size__)
+
+    @property
+    def history_path(self) -> str | None:
+        if self.image_name is None:
+            return None
+
+        annotation_controller = self.parent.parent.annotation_controller
+        return annotation_controller.get_history_path(self.image_name)
+
+    def _load_history(self) -> None:
+        """Read the logged history of the image when it is first needed."""
+        history_path = self.history_path
+
+        if history_path is None or history_path in self.action_cache:
+            return
+
+        history_log = HistoryLog(history_path)
+        undo_stack, redo_stack = history_log.load(self.parent)
+
+        self.action_cache.add_image(history_path, history_log)
+        self.action_cache.add_actions(history_path, undo_stack, redo_stack)
+
+    def _log(self, event: str, action: Action = None) -> None:
+        stacks = self.action_cache[self.history_path]
+        history_log = stacks['log']
+
+        try:
+            history_log.append(event, action)
+
+            if history_log.needs_compaction(
+                    len(stacks['undo']) + len(stacks['redo'])):
+                history_log.compact(
+                    [action for action, _ in stacks['undo']],
+                    [action for action, _ in stacks['redo']])
+
+        # The history is kept in memory regardless
+        except OSError:
+            pass
+
+    def _execute(self, undo: bool) -> Action | None:
+        # Actions can't run while a batch job is writing annotation files
+        if self.parent.batch_handler.running:
+            return None
+
+        self._load_history()
+
+        if self.history_path not in self.action_cache:
+            return None
+
+        self.parent.set_annotating_state(AnnotatingState.IDLE)
+        self.action_cache.move_to_end(self.history_path)
+        stacks = self.action_cache[self.history_path]
+
+        stack_from, stack_to = (stacks['undo'], stacks['redo']) \
+            if undo else (stacks['redo'], stacks['undo'])
+
+        if len(stack_from) == 0:
+            return None
+
+        entry = stack_from.pop()
+        stack_to.append(entry)
+
+        action, _ = entry
+
+        action.undo() if undo else action.do()
+        self.parent.invalidate_geometry()
+
+        self.parent.parent.annotation_list.apply_delta(
+            action.get_delta(undo))
+        self.parent.unsaved_changes = True
+        self.parent.update()
+
+        return action
+
+    def undo(self) -> Action | None:
+        if action := self._execute(undo=True):
+            self._log('undo')
+
+        return action
+
+    def redo(self) -> Action | None:
+        if action := self._execute(undo=False):
+            self._log('redo')
+
+        return action
+
+    def register_action(self, action: Action) -> None:
+        if self.parent.batch_handler.running:
+            return
+
+        self._load_history()
+
+        if self.history_path is None:
+            return
+
+        # Register any move in progress first, so it doesn't replace `action`
+        self.parent.set_annotating_state(AnnotatingState.IDLE)
+
+        self.action_cache.add_action(
+            self.history_path, action, get_action_size(action))
+        self._execute(undo=False)
+
+        self._log('do', action)
+
+    def clear_history(self, image_names: list[str]) -> None:
+        """Forget the history of images whose annotations were changed
+        outside of it, as replaying it would undo those changes."""
+        annotation_controller = self.parent.parent.annotation_controller
+
+        for image_name in image_names:
+            history_path = annotation_controller.get_history_path(image_name)
+            self.action_cache.remove_image(history_path)
+
+            try:
+                os.remove(history_path)
+            except FileNotFoundError:
+                pass
+
+    def reset(self) -> None:
+        """Forget the history of all images, once their logs are gone."""
+        self.action_cache = LRUActionCache(max_size=__history_size__)
+
+
+class LRUActionCache(OrderedDict):
+    """Undo and redo stacks per image, bounded by the memory they hold.
+
+    The stacks hold each action along with its size, measured once when
+    it is added. Once the actions exceed `max_size` bytes, the history of
+    the least recently used images is dropped, then the oldest actions of
+    the current image. The most recent action is always kept.
+    """
+
+    def __init__(self, max_size: int) -> None:
+        super().__init__()
+
+        self.max_size = max_size
+        self.size = 0
+
+    def add_image(self, image_key: str, history_log: 'HistoryLog') -> None:
+        self[image_key] = {
+            'undo': deque(),
+            'redo': deque(),
+            'log': history_log
+        }
+
+    def remove_image(self, image_key: str) -> None:
+        if image_key not in self:
+            return
+
+        stacks = self.pop(image_key)
+        self.size -= sum(size for _, size in stacks['undo'] + stacks['redo'])
+
+    def add_actions(self,
+                    image_key: str,
+                    undo_actions: deque,
+                    redo_actions: deque
+                    ) -> None:
+        stacks = self[image_key]
+
+        for stack, actions in ((stacks['undo'], undo_actions),
+                               (stacks['redo'], redo_actions)):
+            for action in actions:
+                size = get_action_size(action)
+
+                stack.append((action, size))
+                self.size += size
+
+        self._evict()
+
+    def add_action(self, image_key: str, action: Action, size: int) -> None:
+        """Queue `action` as the only action to redo for `image_key`."""
+        self.move_to_end(image_key)
+        stacks = self[image_key]
+
+        self.size -= sum(size for _, size in stacks['redo'])
+        self.size += size
+
+        stacks['redo'].clear()
+        stacks['redo'].append((action, size))
+
+        self._evict()
+
+    def _evict(self) -> None:
+        while self.size > self.max_size:
+            image_key, stacks = next(iter(self.items()))
+
+            if len(self) > 1:
+                self.size -= sum(size for _, size in
+                                 stacks['undo'] + stacks['redo'])
+                del self[image_key]
+
+            elif stacks['undo']:
+                _, size = stacks['undo'].popleft()
+                self.size -= size
+
+            else:
+                break
+
+
+class HistoryLog:
+    """Undo history of an image, persisted as an append-only log.
+
+    Every registered, undone and redone action is appended to the log as
+    one JSON record per line. Replaying the log rebuilds the undo and redo
+    stacks, and once it holds many more records than the stacks it is
+    rewritten to contain only them.
+    """
+
+    def __init__(self, log_path: str) -> None:
+        self.log_path = log_path
+        self.num_records = 0
+
+    def load(self, canvas: 'Canvas') -> tuple[deque, deque]:
+        undo_stack, redo_stack = deque(), deque()
+
+        try:
+            with open(self.log_path, 'r') as log_file:
+                lines = log_file.readlines()
+        except OSError:
+            return undo_stack, redo_stack
+
+        for line in lines:
+            try:
+                record = json.loads(line)
+                event = record['event']
+
+                if record['version'] != __version__:
+                    continue
+
+                if event == 'do':
+                    action = _decode_action(canvas, record['action'])
+
+                    redo_stack.clear()
+                    undo_stack.append(action)
+
+                elif event == 'undo' and undo_stack:
+                    redo_stack.append(undo_stack.pop())
+
+                elif event == 'redo' and redo_stack:
+                    undo_stack.append(redo_stack.pop())
+
+            # Skip records cut short by a crash or written by other versions
+            except (ValueError, KeyError, TypeError, IndexError):
+                continue
+
+        self.num_records = len(lines)
+        return undo_stack, redo_stack
+
+    def append(self, event: str, action: Action = None) -> None:
+        record = {'version': __version__, 'event': event}
+
+        if action is not None:
+            record['action'] = _encode_action(action)
+
+        self._write([record], 'a')
+        self.num_records += 1
+
+    def needs_compaction(self, num_actions: int) -> bool:
+        return self.num_records > max(2 * num_actions, __min_compaction_size__)
+
+    def compact(self,
+                undo_actions: list[Action],
+                redo_actions: list[Action]
+                ) -> None:
+        """Rewrite the log with only the records that rebuild the stacks."""
+        records = [{'version': __version__,
+                    'event': 'do',
+                    'action': _encode_action(action)}
+                   for action in undo_actions + redo_actions[::-1]]
+
+        records += [{'version': __version__, 'event': 'undo'}] \
+            * len(redo_actions)
+
+        self._write(records, 'w')
+        self.num_records = len(records)
+
+    def _write(self, records: list[dict], mode: str) -> None:
+        lines = ''.join(json.dumps(record, separators=(',', ':')) + '\n'
+                        for record in records)
+
+        os.makedirs(os.path.dirname(self.log_path), exist_ok=True)
+
+        if mode == 'a':
+            with open(self.log_path, 'a') as log_file:
+                log_file.write(lines)
+
+            return
+
+        temp_path = f'{self.log_path}.tmp'
+        with open(temp_path, 'w') as log_file:
+            log_file.write(lines)
+
+        os.replace(temp_path, self.log_path)
+
+
+def _encode_action(action: Action) -> dict:
+    schemas = {}
+
+    state = {name: _encode(value, schemas)
+             for name, value in vars(action).items()
+             if name != 'parent'}
+
+    return {'type': type(action).__name__,
+            'schemas': [schema.to_dict() for _, schema in schemas.values()],
+            'state': state}
+
+
+def _decode_action(canvas: 'Canvas', record: dict) -> Action:
+    schemas = [canvas.label_map.resolve_schema(LabelSchema(**schema))
+               for schema in record['schemas']]
+
+    action = __actions__[record['type']].__new__(__actions__[record['type']])
+    action.__dict__.update({name: _decode(value, schemas)
+                            for name, value in record['state'].items()})
+    action.parent = canvas
+
+    return action
+
+
+def _encode(value: Any, schemas: dict[int, tuple[int, LabelSchema]]) -> Any:
+    """Convert action state to JSON. Containers other than lists are
+    wrapped in an object whose single key marks their type. Label schemas
+    are shared between annotations, and stored once per action."""
+    if isinstance(value, LabelSchema):
+        index, _ = schemas.setdefault(id(value), (len(schemas), value))
+        return {'l': index}
+
+    if isinstance(value, AnnotationSnapshot):
+        return {'n': [_encode(getattr(value, name), schemas)
+                      for name in value.__slots__]}
+
+    if isinstance(value, array):
+        return {'a': [value.typecode, value.tolist()]}
+
+    if isinstance(value, dict):
+        return {'d': {key: _encode(item, schemas)
+                      for key, item in value.items()}}
+
+    if isinstance(value, (set, tuple)):
+        key = 's' if isinstance(value, set) else 't'
+        return {key: [_encode(item, schemas) for item in value]}
+
+    if isinstance(value, list):
+        return [_encode(item, schemas) for item in value]
+
+    return value
+
+
+def _decode(value: Any, schemas: list[LabelSchema]) -> Any:
+    if isinstance(value, list):
+        return [_decode(item, schemas) for item in value]
+
+    if not isinstance(value, dict):
+        return value
+
+    (key, item), = value.items()
+
+    if key == 'l':
+        return schemas[item]
+
+    if key == 'n':
+        return AnnotationSnapshot(*_decode(item, schemas))
+
+    if key == 'a':
+        return array(*item)
+
+    if key == 'd':
+        return {name: _decode(entry, schemas) for name, entry in item.items()}
+
+    if key == 's':
+        return set(_decode(item, schemas))
+
+    return tuple(_decode(item, schemas))
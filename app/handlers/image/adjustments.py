@@ -0,0 +1,114 @@
+from dataclasses import dataclass, field
+from functools import lru_cache
+
+import numpy as np
+
+# Channel order of ARGB32 pixels in memory on little-endian machines
+__channels__ = 'blue', 'green', 'red'
+
+__ramp__ = np.arange(256, dtype=np.float64) / 255
+
+
+@dataclass(frozen=True)
+class Adjustments:
+    """Settings that are composed into a single lookup table per channel.
+
+    Levels and gains are given per channel, in the order blue, green, red.
+    """
+
+    gamma: float = 1.0
+    contrast: float = 1.0
+    levels: tuple[tuple[int, int], ...] = field(
+        default=((0, 255),) * len(__channels__))
+    gains: tuple[float, ...] = (1.0,) * len(__channels__)
+
+    @property
+    def is_identity(self) -> bool:
+        return self == Adjustments()
+
+
+@lru_cache(maxsize=64)
+def build_lookup_tables(adjustments: Adjustments) -> np.ndarray:
+    """Compose all adjustments into a (3, 256) table of uint8 values.
+
+    Operations are applied to normalised values in the order levels,
+    contrast, gain, gamma, so the per-pixel cost remains one lookup.
+    """
+    low, high = np.array(adjustments.levels, dtype=np.float64).T / 255
+    gains = np.array(adjustments.gains, dtype=np.float64)
+
+    values = (__ramp__ - low[:, None]) / np.maximum(high - low, 1e-6)[:, None]
+    values = (values - 0.5) * adjustments.contrast + 0.5
+    values = values * gains[:, None]
+    values = np.clip(values, 0, 1) ** adjustments.gamma
+
+    tables = np.rint(values * 255).astype(np.uint8)
+    tables.flags.writeable = False
+
+    return tables
+
+
+@lru_cache(maxsize=16)
+def build_window_table(level: int, width: int) -> np.ndarray:
+    """Map 16-bit values to 8-bit display values for a window/level pair.
+
+    Values below the window are shown black and values above it white.
+    """
+    values = (np.arange(65536, dtype=np.float64) - level) / width + 0.5
+
+    table = np.rint(np.clip(values, 0, 1) * 255).astype(np.uint8)
+    table.flags.writeable = False
+
+    return table
+
+
+def subsample(array: np.ndarray, max_samples: int = 1 << 20) -> np.ndarray:
+    """Return a view of the image on a regular grid of roughly `max_samples`.
+
+    Statistics are estimated from these samples to keep their cost
+    independent of the image size.
+    """
+    height, width = array.shape[:2]
+    stride = max(int(np.sqrt(height * width / max_samples)), 1)
+
+    return array[::stride, ::stride]
+
+
+def compute_window(array: np.ndarray) -> tuple[int, int]:
+    """Find the window/level pair that spans the image's range of values."""
+    samples = subsample(array)
+
+    if samples.ndim == 3:
+        samples = samples[..., :3]
+
+    low, high = int(samples.min()), int(samples.max())
+    width = max(high - low, 1)
+
+    return low + width // 2, width
+
+
+def compute_histograms(array: np.ndarray) -> np.ndarray:
+    """Count the values of each colour channel, returned as (3, 256)."""
+    samples = subsample(array)
+
+    return np.stack([
+        np.bincount(samples[..., channel].ravel(), minlength=256)
+        for channel in range(len(__channels__))])
+
+
+def compute_levels(histograms: np.ndarray,
+                   clip_fraction: float = 0.005
+                   ) -> tuple[tuple[int, int], ...]:
+    """Find per-channel black and white points for an auto-levels stretch.
+
+    The darkest and brightest `clip_fraction` of pixels are saturated,
+    and channels holding a single value are left untouched.
+    """
+    cumulative = np.cumsum(histograms, axis=1)
+    totals = cumulative[:, -1:]
+
+    lows = np.argmax(cumulative > totals * clip_fraction, axis=1)
+    highs = np.argmax(cumulative >= totals * (1 - clip_fraction), axis=1)
+
+    return tuple((int(low), int(high)) if high > low else (0, 255)
+                 for low, high in zip(lows, highs))
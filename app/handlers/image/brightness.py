@@ -1,56 +1,349 @@
-from typing import TYPE_CHECKING
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any
 
 import numpy as np
-from PyQt6.QtCore import QTimer
-from PyQt6.QtGui import QPixmap, QImage
+from PyQt6.QtCore import (
+    QObject,
+    QRunnable,
+    QThreadPool,
+    QTimer,
+    QPoint,
+    QRect,
+    pyqtSignal
+)
+from PyQt6.QtGui import QImage, QPainter
 
+from app.handlers.image.adjustments import (
+    Adjustments,
+    build_lookup_tables,
+    build_window_table,
+    compute_histograms,
+    compute_levels,
+    compute_window,
+    subsample
+)
 from app.utils import clip_value
 
 if TYPE_CHECKING:
     from app.canvas import Canvas
 
+__composition_source__ = QPainter.CompositionMode.CompositionMode_Source
+
+__formats_16bit__ = {
+    QImage.Format.Format_Grayscale16: QImage.Format.Format_Grayscale16,
+    QImage.Format.Format_RGBX64: QImage.Format.Format_RGBA64,
+    QImage.Format.Format_RGBA64: QImage.Format.Format_RGBA64,
+    QImage.Format.Format_RGBA64_Premultiplied: QImage.Format.Format_RGBA64
+}
+
+
+@dataclass
+class BrightnessJob:
+    state: tuple[Any, ...]
+    tiles: list[tuple[int, int, int, int]]
+    source: np.ndarray
+    target: np.ndarray
+    lookup_tables: np.ndarray | None
+    window_source: np.ndarray | None
+    window_table: np.ndarray | None
+
+
+class BrightnessSignals(QObject):
+    finished = pyqtSignal(object)
+
+
+class BrightnessWorker(QRunnable):
+    def __init__(self, job: BrightnessJob, signals: BrightnessSignals) -> None:
+        super().__init__()
+
+        self.job = job
+        self.signals = signals
+
+    @staticmethod
+    def _apply_window(table: np.ndarray,
+                      source: np.ndarray,
+                      target: np.ndarray
+                      ) -> None:
+        if source.ndim == 2:
+            np.take(table, source, out=target[..., 0])
+
+            target[..., 1] = target[..., 0]
+            target[..., 2] = target[..., 0]
+
+        else:
+            # 16-bit colour images are stored as RGBA, displayed as BGRA
+            for channel in range(3):
+                np.take(table, source[..., 2 - channel],
+                        out=target[..., channel])
+
+            target[..., 3] = source[..., 3] >> 8
+
+    def run(self) -> None:
+        job = self.job
+        tables = job.lookup_tables
+        shared_table = tables is not None and (tables == tables[0]).all()
+
+        for top, left, bottom, right in job.tiles:
+            source = job.source[top:bottom, left:right]
+            target = job.target[top:bottom, left:right]
+
+            if job.window_table is not None:
+                self._apply_window(
+                    job.window_table,
+                    job.window_source[top:bottom, left:right],
+                    source)
+
+            if tables is None:
+                continue
+
+            # A single pass over all channels is faster than one per channel
+            if shared_table:
+                np.take(tables[0], source, out=target)
+            else:
+                for channel, table in enumerate(tables):
+                    np.take(table, source[..., channel],
+                            out=target[..., channel])
+
+            target[..., 3] = source[..., 3]
+
+        self.signals.finished.emit(job)
+
 
 class BrightnessHandler:
     _min_steps = 0
     _max_steps = 20
 
+    _min_contrast_steps = 0
+    _max_contrast_steps = 10
+
+    # Side length of the square tiles the image is processed in
+    _tile_size = 512
+
+    # Number of off-screen tiles handed to the worker at once
+    _batch_size = 16
+
     def __init__(self, parent: 'Canvas') -> None:
         self.parent = parent
         self.step = self._min_steps
+        self.contrast_step = self._min_contrast_steps
+
+        self.auto_levels = False
+        self.gains = (1.0, 1.0, 1.0)
+
+        # Window/level pair used to display 16-bit images, None otherwise
+        self.window = None
 
         self._format = QImage.Format.Format_ARGB32
         self._array = None
+        self._buffer = None
+        self._window_source = None
 
-        self._lookup_tables = []
+        self._source_image = None
+        self._buffer_image = None
 
-        # Index possible gamma offset values for runtime efficiency
-        for step in range(self._max_steps + 1):
-            table = np.zeros(256, dtype=np.uint8)
+        self._levels = None
 
-            for index in range(256):
-                table[index] = (index / 255) ** (1 - 0.03 * step) * 255
-
-            self._lookup_tables.append(table)
+        self._tiles = []
+        self._tile_states = {}
+        self._job = None
 
         self.draw_indicator = False
         self.indicator_timer = QTimer()
         self.indicator_timer.timeout.connect(self.unset_indicator)
 
-    def _array_to_pixmap(self, array: np.ndarray) -> QPixmap:
+        self.signals = BrightnessSignals()
+        self.signals.finished.connect(self._on_job_finished)
+
+    @property
+    def adjustments(self) -> Adjustments:
+        levels = Adjustments().levels
+
+        if self.auto_levels and self._array is not None:
+            if self._levels is None:
+                self._levels = compute_levels(
+                    compute_histograms(self._get_display_samples()))
+
+            levels = self._levels
+
+        return Adjustments(gamma=1 - 0.03 * self.step,
+                           contrast=1 + 0.1 * self.contrast_step,
+                           levels=levels,
+                           gains=self.gains)
+
+    @property
+    def indicator_text(self) -> str:
+        text = f'Brightness amplification: {self.step * 5}%'
+
+        if self.contrast_step:
+            text += f', contrast: +{self.contrast_step * 10}%'
+
+        if self.auto_levels:
+            text += ', auto levels'
+
+        if self.window:
+            level, width = self.window
+            text += f', window: {width} at {level}'
+
+        return text
+
+    def _array_to_image(self, array: np.ndarray) -> QImage:
         data, strides = array.data, array.strides[0]
         height, width, _ = array.shape
 
-        image = QImage(data, width, height, strides, self._format)
-        return QPixmap.fromImage(image)
+        # The image wraps the array's memory rather than copying it
+        return QImage(data, width, height, strides, self._format)
+
+    @staticmethod
+    def _image_to_array(image: QImage,
+                        dtype: type,
+                        num_channels: int
+                        ) -> np.ndarray:
+        width, height = image.width(), image.height()
+        itemsize = np.dtype(dtype).itemsize
+
+        pointer = image.bits()
+        pointer.setsize(image.bytesPerLine() * height)
+
+        array = np.frombuffer(pointer, dtype=dtype)
+        array = array.reshape((height, image.bytesPerLine() // itemsize))
+        array = array[:, :width * num_channels]
+
+        shape = (height, width, num_channels) if num_channels > 1 \
+            else (height, width)
+
+        return array.reshape(shape).copy()
+
+    def _get_display_samples(self) -> np.ndarray:
+        """Return a subsample of the image as it is displayed, before
+        any adjustments are applied, in BGR channel order."""
+        if self._window_source is None:
+            return subsample(self._array)
+
+        samples = build_window_table(*self.window)[
+            subsample(self._window_source)]
+
+        if samples.ndim == 2:
+            return np.stack([samples] * 3, axis=-1)
+
+        return samples[..., 2::-1]
+
+    def _get_visible_area(self) -> tuple[float, float, float, float]:
+        height, width, _ = self._array.shape
+
+        scale = self.parent.get_scale()
+        offset_x, offset_y = self.parent.get_center_offset()
+
+        if not scale:
+            return 0, 0, width, height  # The canvas hasn't been laid out yet
+
+        canvas_width = self.parent.width()
+        canvas_height = self.parent.height()
+
+        left = clip_value(-offset_x / scale, 0, width)
+        top = clip_value(-offset_y / scale, 0, height)
+        right = clip_value((canvas_width - offset_x) / scale, 0, width)
+        bottom = clip_value((canvas_height - offset_y) / scale, 0, height)
+
+        return left, top, right, bottom
+
+    @staticmethod
+    def _is_visible(tile: tuple[int, ...], area: tuple[float, ...]) -> bool:
+        top, left, bottom, right = tile
+        area_left, area_top, area_right, area_bottom = area
+
+        return left < area_right and right > area_left \
+            and top < area_bottom and bottom > area_top
+
+    def _schedule(self) -> None:
+        """Hand the next batch of outdated tiles to the worker.
+
+        Only one job is in flight at a time, so steps requested in the
+        meantime are coalesced and only the latest one gets rendered.
+        """
+        if self._job or self._array is None:
+            return
+
+        area = self._get_visible_area()
+        adjustments = self.adjustments
+        state = self.window, adjustments
+
+        outdated_tiles = [tile for tile in self._tiles
+                          if self._tile_states[tile] != state]
+
+        if not outdated_tiles:
+            return
+
+        visible_tiles = [tile for tile in outdated_tiles
+                         if self._is_visible(tile, area)]
+
+        lookup_tables = None if adjustments.is_identity \
+            else build_lookup_tables(adjustments)
+
+        window_table = build_window_table(*self.window) \
+            if self.window else None
+
+        self._job = BrightnessJob(
+            state,
+            visible_tiles or outdated_tiles[:self._batch_size],
+            self._array,
+            self._buffer,
+            lookup_tables,
+            self._window_source,
+            window_table)
+
+        QThreadPool.globalInstance().start(
+            BrightnessWorker(self._job, self.signals))
+
+    def _on_job_finished(self, job: BrightnessJob) -> None:
+        if job is not self._job:
+            return  # The image was changed while the job was running
+
+        self._job = None
+
+        image = self._source_image if job.lookup_tables is None \
+            else self._buffer_image
+
+        painter = QPainter(self.parent.pixmap)
+        painter.setCompositionMode(__composition_source__)
+
+        for top, left, bottom, right in job.tiles:
+            painter.drawImage(QPoint(left, top), image,
+                              QRect(left, top, right - left, bottom - top))
+
+            self._tile_states[top, left, bottom, right] = job.state
+
+        painter.end()
+
+        area = self._get_visible_area()
+        if any(self._is_visible(tile, area) for tile in job.tiles):
+            self.parent.update()
+
+        self._schedule()
 
     def _set_brightness(self, step: int) -> None:
         self.step = clip_value(step, self._min_steps, self._max_steps)
-        lookup_table = self._lookup_tables[self.step]
 
-        array = self._array.copy()
-        array[..., :3] = lookup_table[array[..., :3]]
+        self._schedule()
+        self.set_indicator()
+
+    def _set_contrast(self, step: int) -> None:
+        self.contrast_step = clip_value(
+            step, self._min_contrast_steps, self._max_contrast_steps)
+
+        self._schedule()
+        self.set_indicator()
+
+    def _set_window(self, level: float, width: float) -> None:
+        if not self.window:
+            return
+
+        width = int(clip_value(width, 1, 65536))
+        level = int(clip_value(level, 0, 65535))
+
+        self.window = level, width
+        self._levels = None
 
-        self.parent.pixmap = self._array_to_pixmap(array)
+        self._schedule()
         self.set_indicator()
 
     def increase_brightness(self) -> None:
@@ -65,6 +358,63 @@ class BrightnessHandler:
         else:
             self._set_brightness(self._max_steps)
 
+    def increase_contrast(self) -> None:
+        self._set_contrast(self.contrast_step + 1)
+
+    def decrease_contrast(self) -> None:
+        self._set_contrast(self.contrast_step - 1)
+
+    def toggle_auto_levels(self) -> None:
+        self.auto_levels = not self.auto_levels
+
+        self._schedule()
+        self.set_indicator()
+
+    def set_gains(self, gains: tuple[float, float, float]) -> None:
+        """Set the per-channel gains, given in blue, green, red order."""
+        self.gains = gains
+
+        self._schedule()
+        self.set_indicator()
+
+    def narrow_window(self) -> None:
+        if self.window:
+            level, width = self.window
+            self._set_window(level, width / 1.25)
+
+    def widen_window(self) -> None:
+        if self.window:
+            level, width = self.window
+            self._set_window(level, width * 1.25)
+
+    def increase_level(self) -> None:
+        if self.window:
+            level, width = self.window
+            self._set_window(level + width / 10, width)
+
+    def decrease_level(self) -> None:
+        if self.window:
+            level, width = self.window
+            self._set_window(level - width / 10, width)
+
+    def drag_window(self,
+                    window_start: tuple[int, int],
+                    cursor_shift: tuple[float, float]
+                    ) -> None:
+        """Dragging right widens the window, dragging up lowers the level."""
+        if not (self.window and window_start):
+            return
+
+        level, width = window_start
+        shift_x, shift_y = cursor_shift
+
+        self._set_window(level + shift_y * width / 500,
+                         width * 2 ** (shift_x / 200))
+
+    def reset_window(self) -> None:
+        if self.window:
+            self._set_window(*compute_window(self._window_source))
+
     def unset_indicator(self) -> None:
         self.draw_indicator = False
         self.parent.update()
@@ -73,19 +423,58 @@ class BrightnessHandler:
         self.draw_indicator = True
         self.indicator_timer.start(2000)
 
-    def set_pixmap(self, pixmap: QPixmap) -> None:
-        image = pixmap.toImage().convertToFormat(self._format)
-        width, height = image.width(), image.height()
+    def set_image(self, image: QImage) -> None:
+        if image.format() in __formats_16bit__:
+            image = image.convertToFormat(__formats_16bit__[image.format()])
+            num_channels = 1 if image.format() \
+                == QImage.Format.Format_Grayscale16 else 4
 
-        pointer = image.bits()
-        pointer.setsize(image.bytesPerLine() * height)
+            # Keep the native values, the displayed ones are derived from
+            # them through the window for each tile
+            self._window_source = self._image_to_array(
+                image, np.uint16, num_channels)
+            self.window = compute_window(self._window_source)
+
+            self._array = np.full(
+                (image.height(), image.width(), 4), 255, dtype=np.uint8)
+
+        else:
+            image = image.convertToFormat(self._format)
+            self._array = self._image_to_array(image, np.uint8, 4)
+
+        # Allocated once per image and reused by every brightness step
+        self._buffer = np.empty_like(self._array)
+
+        self._source_image = self._array_to_image(self._array)
+        self._buffer_image = self._array_to_image(self._buffer)
 
-        array = np.frombuffer(pointer, dtype=np.uint8)
-        array = array.reshape((height, image.bytesPerLine()))
-        array = array[:, :width * 4].reshape((height, width, 4))
+        height, width, _ = self._array.shape
 
-        self._array = array.reshape(image.height(), image.width(), 4).copy()
+        self._tiles = [
+            (top, left,
+             min(top + self._tile_size, height),
+             min(left + self._tile_size, width))
+            for top in range(0, height, self._tile_size)
+            for left in range(0, width, self._tile_size)]
+
+        # Tiles of 16-bit images are outdated until the window is applied
+        initial_state = None if self.window else (None, Adjustments())
+
+        self._levels = None
+        self._tile_states = {tile: initial_state for tile in self._tiles}
+
+        self._schedule()
 
     def reset(self) -> None:
+        self._job = None
+        self._array = None
+        self._window_source = None
+
         self.step = self._min_steps
+        self.contrast_step = self._min_contrast_steps
+
+        self.auto_levels = False
+        self.gains = (1.0, 1.0, 1.0)
+        self.window = None
+
         self.unset_indicator()
@@ -3,8 +3,11 @@ from typing import TYPE_CHECKING
 from PyQt6.QtCore import Qt, QTimer
 from PyQt6.QtGui import QKeyEvent
 
+from app.enums.canvas import AnnotatingState
+
 if TYPE_CHECKING:
     from app.canvas import Canvas
+    from app.objects import Annotation, Keypoint
 
 
 class KeyboardHandler:
@@ -29,6 +32,15 @@ class KeyboardHandler:
         self.key_autorepeat_delay.timeout.connect(
             self.key_autorepeat_timer.start)
 
+        # Consecutive arrow key presses moving the same object are
+        # registered as a single action, once they have stopped
+        self.nudge_target = None
+
+        self.nudge_timer = QTimer()
+        self.nudge_timer.setInterval(500)
+        self.nudge_timer.setSingleShot(True)
+        self.nudge_timer.timeout.connect(self._end_nudge)
+
     def _reset_number(self) -> None:
         self.typed_number = ''
 
@@ -38,6 +50,21 @@ class KeyboardHandler:
         if not self.pressed_keys:
             self.key_autorepeat_timer.stop()
 
+    def _end_nudge(self) -> None:
+        if self.pressed_keys:
+            self.nudge_timer.start()
+
+        elif self.nudge_target is not None:
+            self.parent.set_annotating_state(AnnotatingState.IDLE)
+
+    def nudge(self, target: 'Annotation | Keypoint') -> None:
+        self.nudge_target = target
+        self.nudge_timer.start()
+
+    def reset_nudge(self) -> None:
+        self.nudge_target = None
+        self.nudge_timer.stop()
+
     def on_number_press(self, event: QKeyEvent) -> None:
         self.typed_number += event.text()
 
@@ -19,6 +19,7 @@ class MouseHandler:
 
         self.drag_start_pos = None
         self.drag_start_pan = None
+        self.drag_start_window = None
 
     def _get_cursor_position(self, event: QMouseEvent) -> tuple[int, int]:
         offset_x, offset_y = self.parent.get_center_offset()
@@ -44,11 +45,14 @@ class MouseHandler:
             # Shift is calculated differently here as panning the image uses
             # a different coordinate system compared to dragging an annotation
             current_pos = event.position()
+            ctrl_pressed = Qt.KeyboardModifier.ControlModifier \
+                & event.modifiers()
 
             shift_x = current_pos.x() - self.drag_start_pos.x()
             shift_y = current_pos.y() - self.drag_start_pos.y()
 
-            self.parent.on_mouse_right_drag((shift_x, shift_y))
+            self.parent.on_mouse_right_drag((shift_x, shift_y),
+                                            bool(ctrl_pressed))
 
         else:
             self.parent.on_mouse_hover()
@@ -65,6 +69,7 @@ class MouseHandler:
             self.drag_start_pos = event.position()
             self.drag_start_pan = (self.parent.zoom_handler.pan_x,
                                    self.parent.zoom_handler.pan_y)
+            self.drag_start_window = self.parent.brightness_handler.window
 
         if Qt.MouseButton.MiddleButton & event.buttons():
             self.parent.on_mouse_middle_press(position, ctrl_pressed)
@@ -172,9 +172,8 @@ class CanvasPainter(QPainter):
 
         self.drawText(QPointF(text_x, text_y), f'{zoom_level}X')
 
-    def draw_brightness_indicator(self, step: int) -> None:
+    def draw_brightness_indicator(self, text: str) -> None:
         self.setPen(QColor(200, 200, 200, 255))
-        text = f'Brightness amplification: {step * 5}%'
 
         font_metrics = self.fontMetrics()
         text_width = font_metrics.horizontalAdvance(text)
@@ -228,7 +227,8 @@ class CanvasPainter(QPainter):
             self.draw_zoom_indicator(self.canvas.zoom_handler.zoom_level)
 
         if self.canvas.brightness_handler.draw_indicator:
-            self.draw_brightness_indicator(self.canvas.brightness_handler.step)
+            self.draw_brightness_indicator(
+                self.canvas.brightness_handler.indicator_text)
 
 
 class AnnotationPainter:
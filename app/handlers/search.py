@@ -0,0 +1,363 @@
+import fnmatch
+import heapq
+import json
+import os
+import re
+from bisect import bisect_left
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable
+
+from PyQt6.QtCore import QObject, QRunnable, pyqtSignal
+
+__chunk_size__ = 8192
+__fuzzy_cutoff__ = 60
+__max_cached_queries__ = 4096
+__max_cached_options__ = 32
+
+
+@dataclass
+class ImageQuery:
+    """Image search query, parsed from whitespace separated terms.
+
+    `~text` matches names fuzzily, `re:pattern` by regular expression and
+    terms containing `*`, `?` or `[` as a glob. `is:annotated`,
+    `is:unannotated` and `has:category` filter by annotation state.
+    Any other term must be contained in the name. All terms must match.
+    """
+
+    substrings: list[str] = field(default_factory=list)
+    patterns: list[Callable] = field(default_factory=list)
+    fuzzy: str | None = None
+
+    annotated: bool | None = None
+    categories: list[str] = field(default_factory=list)
+
+    @classmethod
+    def parse(cls, text: str) -> 'ImageQuery':
+        query = cls()
+
+        for term in text.split():
+            if term.startswith('~') and len(term) > 1:
+                query.fuzzy = f'{query.fuzzy} {term[1:]}' \
+                    if query.fuzzy else term[1:]
+
+            elif term.startswith('re:') and len(term) > 3:
+                try:
+                    pattern = re.compile(term[3:])
+                except re.error:
+                    pattern = re.compile(re.escape(term[3:]))
+
+                query.patterns.append(pattern.search)
+
+            elif any(char in term for char in '*?['):
+                pattern = re.compile(fnmatch.translate(term))
+                query.patterns.append(pattern.match)
+
+            elif term in ('is:annotated', 'is:unannotated'):
+                query.annotated = term == 'is:annotated'
+
+            elif term.startswith('has:') and len(term) > 4:
+                query.categories.append(_normalize(term[4:]))
+
+            else:
+                query.substrings.append(term)
+
+        return query
+
+    @property
+    def is_plain(self) -> bool:
+        return len(self.substrings) <= 1 and not (
+            self.patterns or self.fuzzy
+            or self.annotated is not None or self.categories)
+
+    @property
+    def text(self) -> str:
+        return self.substrings[0] if self.substrings else ''
+
+    @property
+    def filters_annotations(self) -> bool:
+        return self.annotated is not None or bool(self.categories)
+
+    def matches_name(self, name: str) -> bool:
+        return all(substring in name for substring in self.substrings) \
+            and all(pattern(name) for pattern in self.patterns)
+
+    def matches_labels(self, label_names: frozenset[str]) -> bool:
+        if self.annotated is not None \
+                and self.annotated != bool(label_names):
+            return False
+
+        return all(category in label_names for category in self.categories)
+
+
+class AnnotationManifest:
+    """Label names present in each image's annotation file.
+
+    Entries are read on demand and cached along with the modification
+    time of the file, so they are only read again once it changes.
+    """
+
+    def __init__(self, get_json_path: Callable[[str], str]) -> None:
+        self.get_json_path = get_json_path
+        self._entries = {}
+
+    def get_label_names(self, image_name: str) -> frozenset[str]:
+        json_path = self.get_json_path(image_name)
+
+        try:
+            mtime = os.stat(json_path).st_mtime_ns
+        except OSError:
+            return frozenset()
+
+        entry = self._entries.get(json_path)
+        if entry and entry[0] == mtime:
+            return entry[1]
+
+        try:
+            with open(json_path, 'r') as json_file:
+                annotations = json.load(json_file)['annotations']
+
+            label_names = frozenset(
+                _normalize(anno['label_schema']['label_name'])
+                for anno in annotations)
+
+        except (OSError, ValueError, KeyError, TypeError):
+            label_names = frozenset()
+
+        self._entries[json_path] = mtime, label_names
+        return label_names
+
+
+@dataclass
+class SearchJob:
+    query: ImageQuery
+    names: list[str]
+    manifest: AnnotationManifest
+    limit: int
+
+    cancelled: bool = False
+
+
+class SearchSignals(QObject):
+    results = pyqtSignal(object, list, bool)
+
+
+class SearchWorker(QRunnable):
+    """Runs a search job in chunks, emitting the results found so far after
+    every chunk that changed them, until the job is done or cancelled."""
+
+    def __init__(self, job: SearchJob, signals: SearchSignals) -> None:
+        super().__init__()
+
+        self.job = job
+        self.signals = signals
+
+    def _filter(self, start: int, end: int) -> list[int]:
+        query, names = self.job.query, self.job.names
+
+        indices = [index for index in range(start, end)
+                   if query.matches_name(names[index])]
+
+        if query.filters_annotations:
+            get_label_names = self.job.manifest.get_label_names
+
+            indices = [index for index in indices if query.matches_labels(
+                get_label_names(names[index]))]
+
+        return indices
+
+    def _score(self, indices: list[int]) -> list[tuple[float, int]]:
+        from rapidfuzz.fuzz import partial_ratio
+        from rapidfuzz.process import extract
+        from rapidfuzz.utils import default_process
+
+        names = [self.job.names[index] for index in indices]
+
+        matches = extract(self.job.query.fuzzy,
+                          names,
+                          scorer=partial_ratio,
+                          processor=default_process,
+                          score_cutoff=__fuzzy_cutoff__,
+                          limit=self.job.limit)
+
+        return [(score, -indices[position])
+                for _, score, position in matches]
+
+    def run(self) -> None:
+        job = self.job
+        found, best = [], []
+
+        for start in range(0, len(job.names), __chunk_size__):
+            if job.cancelled:
+                return
+
+            end = min(start + __chunk_size__, len(job.names))
+            indices = self._filter(start, end)
+
+            if job.query.fuzzy:
+                best = heapq.nlargest(job.limit, best + self._score(indices))
+                indices = [-index for _, index in best]
+
+                if indices != found:
+                    found = indices
+                    self.signals.results.emit(job, found, False)
+
+            elif indices and len(found) < job.limit:
+                found = (found + indices)[:job.limit]
+                self.signals.results.emit(job, found, False)
+
+            if len(found) == job.limit and not job.query.fuzzy:
+                break
+
+        if not job.cancelled:
+            self.signals.results.emit(job, found, True)
+
+
+@dataclass(eq=False)
+class LabelOptions:
+    """A subset of the label map offered by a category picker, along with
+    the results of the queries already matched against it."""
+
+    indices: list[int]
+    choices: list[str]
+    members: set[int]
+
+    hits: dict[str, list[int]] = field(default_factory=dict)
+    results: dict[str, list[str]] = field(default_factory=dict)
+
+
+class LabelMatcher:
+    """Ranks label names against the text typed into a category picker.
+
+    Names starting with the query come first, then names containing it,
+    then the closest fuzzy matches. Choices are normalised once per label
+    map, and results are memoised per query for each set of options. Only
+    the most recently used sets of options are kept.
+    """
+
+    def __init__(self, label_names: list[str], workers: int = 1) -> None:
+        self.label_names = label_names
+        self.workers = workers
+
+        self._choices = [_normalize(name) for name in label_names]
+        self._indices = {name: index for index, name in enumerate(label_names)}
+
+        self._prefixes = sorted(zip(self._choices, range(len(label_names))))
+        self._options = OrderedDict()
+
+    def get_options(self, label_names: list[str]) -> LabelOptions:
+        key = tuple(label_names)
+
+        if key in self._options:
+            self._options.move_to_end(key)
+            return self._options[key]
+
+        indices = sorted(self._indices[name] for name in label_names
+                         if name in self._indices)
+
+        self._options[key] = LabelOptions(
+            indices=indices,
+            choices=[self._choices[index] for index in indices],
+            members=set(indices))
+
+        if len(self._options) > __max_cached_options__:
+            self._options.popitem(last=False)
+
+        return self._options[key]
+
+    def _get_prefix_hits(self, query: str, options: LabelOptions) -> list[int]:
+        hits = []
+
+        for position in range(bisect_left(self._prefixes, (query,)),
+                              len(self._prefixes)):
+            choice, index = self._prefixes[position]
+
+            if not choice.startswith(query):
+                break
+
+            if index in options.members:
+                hits.append(index)
+
+        return sorted(hits)
+
+    def _get_substring_hits(self,
+                            query: str,
+                            options: LabelOptions
+                            ) -> list[int]:
+        if query in options.hits:
+            return options.hits[query]
+
+        # Names containing the query also contain any prefix of it
+        candidates = options.indices
+
+        for length in range(len(query) - 1, 0, -1):
+            if query[:length] in options.hits:
+                candidates = options.hits[query[:length]]
+                break
+
+        hits = [index for index in candidates
+                if query in self._choices[index]]
+
+        options.hits[query] = hits
+        return hits
+
+    def _get_fuzzy_hits(self,
+                        query: str,
+                        options: LabelOptions,
+                        limit: int
+                        ) -> list[int]:
+        from rapidfuzz.fuzz import partial_ratio
+        from rapidfuzz.process import cdist, extract
+
+        if self.workers == 1:
+            matches = extract(query,
+                              options.choices,
+                              scorer=partial_ratio,
+                              limit=limit)
+
+            return [options.indices[position] for _, _, position in matches]
+
+        import numpy as np
+
+        scores = cdist([query],
+                       options.choices,
+                       scorer=partial_ratio,
+                       workers=self.workers)[0]
+
+        positions = np.argsort(-scores, kind='stable')[:limit]
+        return [options.indices[position] for position in positions]
+
+    def extract(self,
+                query: str,
+                options: LabelOptions,
+                limit: int
+                ) -> list[str]:
+        query = _normalize(query)
+
+        if query in options.results:
+            return options.results[query]
+
+        found = self._get_prefix_hits(query, options)[:limit] \
+            if query else []
+
+        if query and len(found) < limit:
+            found += [index for index in
+                      self._get_substring_hits(query, options)
+                      if index not in found][:limit - len(found)]
+
+        if len(found) < limit:
+            found += [index for index in
+                      self._get_fuzzy_hits(query, options, limit + len(found))
+                      if index not in found][:limit - len(found)]
+
+        if len(options.results) >= __max_cached_queries__:
+            options.results.clear()
+            options.hits.clear()
+
+        options.results[query] = [self.label_names[index] for index in found]
+        return options.results[query]
+
+
+def _normalize(label_name: str) -> str:
+    return label_name.lower().replace(' ', '_')
@@ -0,0 +1,126 @@
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from app.enums.annotation import HoverType
+from app.objects import Annotation
+
+if TYPE_CHECKING:
+    from app.canvas import Canvas
+
+
+class SelectionTransform:
+    """Moves or resizes several annotations as one.
+
+    Their coordinates are packed into arrays when the transform starts, and
+    each step applies it to all of them at once before writing them back.
+    Dragging the selection by an edge or corner of one of its annotations
+    scales it away from the opposite side of the selection's bounding box,
+    otherwise it is moved. Either way it stays within the image.
+    """
+
+    def __init__(self,
+                 parent: 'Canvas',
+                 annotations: list[Annotation],
+                 hover_type: HoverType = HoverType.FULL
+                 ) -> None:
+        self.parent = parent
+        self.hover_type = hover_type
+
+        self.annotations = [anno for anno in annotations
+                            if anno.position or anno.implicit_bbox]
+
+        self.pos_start = [(anno.position or anno.implicit_bbox).copy()
+                          for anno in self.annotations]
+        self.kpts_start = [kpt.position.copy() for anno in self.annotations
+                           for kpt in anno.keypoints]
+
+        movable_kpts = {
+            anno.ref_id for anno in self.annotations
+            if parent.visibility_handler.has_movable_keypoints(anno)}
+
+        # Implicit bboxes only move along with the keypoints they fit
+        self.box_annos = [anno for anno in self.annotations
+                          if anno.has_bbox or anno.ref_id in movable_kpts]
+        self.keypoints = [kpt for anno in self.annotations
+                          if anno.ref_id in movable_kpts
+                          for kpt in anno.keypoints]
+
+        self.boxes = np.array(
+            [anno.position or anno.implicit_bbox for anno in self.box_annos],
+            dtype=float).reshape(-1, 2)
+        self.kpts = np.array([kpt.position for kpt in self.keypoints],
+                             dtype=float).reshape(-1, 2)
+
+        self.visible = np.array([kpt.visible for kpt in self.keypoints],
+                                dtype=bool)
+        points = np.concatenate([self.boxes, self.kpts[self.visible]])
+
+        self.image_size = np.array(
+            (parent.pixmap.width(), parent.pixmap.height()), dtype=float)
+        self.offset = np.zeros(2)
+
+        # Bounding box of the selection, as its top left and bottom right
+        self.lower, self.upper = self.offset, self.offset
+
+        self.min_offset, self.max_offset = self.offset, self.offset
+        if len(points):
+            self.lower, self.upper = points.min(axis=0), points.max(axis=0)
+
+            self.min_offset = np.minimum(-self.lower, 0)
+            self.max_offset = np.maximum(self.image_size - self.upper, 0)
+
+        # Edges of the bounding box that follow the cursor when scaling
+        self.drag_lower = np.array((bool(hover_type & HoverType.LEFT),
+                                    bool(hover_type & HoverType.TOP)))
+        self.drag_upper = np.array((bool(hover_type & HoverType.RIGHT),
+                                    bool(hover_type & HoverType.BOTTOM)))
+
+    def translate(self, delta: tuple[float, float]) -> None:
+        self.offset = np.clip(self.offset + delta,
+                              self.min_offset, self.max_offset)
+
+        self._write(self.boxes + self.offset, self.kpts + self.offset)
+
+    def scale(self, delta: tuple[float, float]) -> None:
+        """Move the dragged edges of the bounding box by the total of the
+        deltas so far, keeping them in the image and at least a pixel
+        from the opposite edges, and scale the selection to match."""
+        self.offset = self.offset + delta
+
+        lower = np.where(
+            self.drag_lower,
+            np.minimum(np.maximum(self.lower + self.offset, 0),
+                       self.upper - 1),
+            self.lower)
+        upper = np.where(
+            self.drag_upper,
+            np.maximum(np.minimum(self.upper + self.offset, self.image_size),
+                       self.lower + 1),
+            self.upper)
+
+        # Axes along which the selection has no extent are left as they are
+        extent = self.upper - self.lower
+        scalable = extent > 0
+
+        factor = np.where(
+            scalable, (upper - lower) / np.where(scalable, extent, 1), 1)
+        anchor = np.where(self.drag_lower, self.upper, self.lower)
+
+        kpts = self.kpts.copy()
+        kpts[self.visible] = anchor + (kpts[self.visible] - anchor) * factor
+
+        self._write(anchor + (self.boxes - anchor) * factor, kpts)
+
+    def _write(self, boxes: np.ndarray, kpts: np.ndarray) -> None:
+        boxes = boxes.reshape(-1, 4).tolist()
+        kpts = kpts.tolist()
+
+        for anno, box in zip(self.box_annos, boxes):
+            if anno.has_bbox:
+                anno.position = box
+            else:
+                anno.implicit_bbox = box
+
+        for keypoint, position in zip(self.keypoints, kpts):
+            keypoint.position = position
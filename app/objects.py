@@ -1,4 +1,6 @@
-import copy
+from array import array
+from dataclasses import dataclass, replace
+from typing import Iterable
 from uuid import uuid4
 
 from app.enums.annotation import HoverType, SelectionType, VisibilityType
@@ -6,6 +8,8 @@ from app.controllers.label_map_controller import LabelSchema
 
 
 class Bbox:
+    __slots__ = ('position', 'has_bbox')
+
     def __init__(self, position: list[int, ...] = None) -> None:
         self.position = position or []
         self.has_bbox = bool(position)
@@ -44,6 +48,9 @@ class Bbox:
 
 
 class Keypoint:
+    __slots__ = ('parent', 'position', 'visible', 'index', 'hovered',
+                 'selected')
+
     def __init__(self,
                  parent: 'Annotation',
                  position: list[int],
@@ -53,13 +60,12 @@ class Keypoint:
         self.position = position
         self.visible = visible
 
+        # Set along with the parent once the keypoint is added to it
+        self.index = None
+
         self.hovered = False
         self.selected = False
 
-    @property
-    def index(self) -> int:
-        return self.parent.keypoints.index(self)
-
     @property
     def pos_x(self) -> int:
         return self.position[0]
@@ -70,6 +76,9 @@ class Keypoint:
 
 
 class Annotation(Bbox):
+    __slots__ = ('label_schema', 'ref_id', '_keypoints', 'selected',
+                 'visible', 'hovered', 'highlighted', 'implicit_bbox')
+
     def __init__(self,
                  label_schema: LabelSchema,
                  position: list[int] = None,
@@ -98,20 +107,17 @@ class Annotation(Bbox):
 
         return False
 
-    def __copy__(self) -> 'Annotation':
-        box_only = self.selected == SelectionType.BOX_ONLY
-        keypoints = None if box_only else self.keypoints
-
-        copied_anno = Annotation(copy.copy(self.label_schema),
-                                 copy.copy(self.position),
-                                 copy.deepcopy(keypoints))
-
-        copied_anno.implicit_bbox = self.implicit_bbox.copy()
+    @property
+    def keypoints(self) -> list[Keypoint]:
+        return self._keypoints
 
-        for keypoint in copied_anno.keypoints:
-            keypoint.parent = copied_anno
+    @keypoints.setter
+    def keypoints(self, keypoints: list[Keypoint]) -> None:
+        for index, keypoint in enumerate(keypoints):
+            keypoint.parent = self
+            keypoint.index = index
 
-        return copied_anno
+        self._keypoints = keypoints
 
     @property
     def label_name(self) -> str:
@@ -198,17 +204,94 @@ class Annotation(Bbox):
 
         self.label_schema = label_schema
 
-    def copy(self) -> 'Annotation':
-        copied = Annotation(copy.copy(self.label_schema))
-        copied.ref_id = self.ref_id
 
-        copied.position = self.position.copy()
-        copied.keypoints = copy.deepcopy(self.keypoints)
+@dataclass(frozen=True, slots=True)
+class AnnotationSnapshot:
+    """Persistent state of an annotation, packed for the undo history.
+
+    Coordinates are stored in flat arrays and the label schema is shared
+    rather than copied, so a snapshot takes a fraction of the memory of a
+    copied annotation.
+    """
+
+    ref_id: str
+    label_schema: LabelSchema
+
+    position: array
+    implicit_bbox: array
+    has_bbox: bool
+
+    kpt_positions: array
+    kpt_visible: int
+
+    @classmethod
+    def from_annotation(cls,
+                        anno: Annotation,
+                        box_only: bool = False
+                        ) -> 'AnnotationSnapshot':
+        """Snapshot `anno`, leaving out its keypoints if `box_only`."""
+        kpt_positions = [[0, 0]] * len(anno.keypoints) if box_only \
+            else (kpt.position for kpt in anno.keypoints)
+
+        kpt_visible = 0 if box_only else sum(
+            1 << index for index, keypoint in enumerate(anno.keypoints)
+            if keypoint.visible)
+
+        return cls(anno.ref_id,
+                   anno.label_schema,
+                   pack_values(anno.position),
+                   pack_values(anno.implicit_bbox),
+                   anno.has_bbox,
+                   pack_positions(kpt_positions),
+                   kpt_visible)
+
+    @property
+    def bbox(self) -> tuple[int | float, ...]:
+        return tuple(self.position or self.implicit_bbox)
+
+    def copy(self) -> 'AnnotationSnapshot':
+        """Snapshot of a new annotation with the same state."""
+        return replace(self,
+                       ref_id=uuid4().hex,
+                       position=_copy_array(self.position),
+                       implicit_bbox=_copy_array(self.implicit_bbox),
+                       kpt_positions=_copy_array(self.kpt_positions))
+
+    def to_annotation(self) -> Annotation:
+        keypoints = [
+            Keypoint(None, position, bool(self.kpt_visible >> index & 1))
+            for index, position
+            in enumerate(unpack_positions(self.kpt_positions))]
+
+        anno = Annotation(self.label_schema,
+                          self.position.tolist(),
+                          keypoints,
+                          self.ref_id)
+
+        anno.implicit_bbox = self.implicit_bbox.tolist()
+        anno.has_bbox = self.has_bbox
+
+        return anno
+
+
+def pack_values(values: list[int | float]) -> array:
+    """Pack coordinates into an array, keeping integers as integers."""
+    values = list(values)
+
+    return array('q', values) \
+        if all(isinstance(value, int) for value in values) \
+        else array('d', values)
+
+
+def pack_positions(positions: Iterable[list[int | float]]) -> array:
+    return pack_values(value for position in positions for value in position)
+
+
+def unpack_positions(values: array) -> list[list[int | float]]:
+    values = values.tolist()
 
-        copied.has_bbox = self.has_bbox
-        copied.implicit_bbox = self.implicit_bbox.copy()
+    return [values[index:index + 2] for index in range(0, len(values), 2)]
 
-        for kpt in copied.keypoints:
-            kpt.parent = copied
 
-        return copied
+def _copy_array(values: array) -> array:
+    return array(values.typecode, values)
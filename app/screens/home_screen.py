@@ -9,8 +9,11 @@ class HomeScreen(QWidget):
         super().__init__()
         self.svg_size = 1350, 675
 
+        self.path_alt = path_alt
+
+        # The highlighted variant is only needed once a drag enters
         self.renderer_default = QSvgRenderer(path_default)
-        self.renderer_alt = QSvgRenderer(path_alt)
+        self.renderer_alt = None
         self.renderer = self.renderer_default
 
         self.label = QLabel(self)
@@ -20,8 +23,6 @@ class HomeScreen(QWidget):
         self.layout.addWidget(self.label, 0, Qt.AlignmentFlag.AlignCenter)
         self.setLayout(self.layout)
 
-        self._update_pixmap()
-
     def _update_pixmap(self) -> None:
         pixmap = QPixmap(self.width(), self.height())
         pixmap.fill(Qt.GlobalColor.transparent)
@@ -39,6 +40,9 @@ class HomeScreen(QWidget):
         painter.end()
 
     def set_highlighted(self, highlighted: bool) -> None:
+        if highlighted and self.renderer_alt is None:
+            self.renderer_alt = QSvgRenderer(self.path_alt)
+
         self.renderer = self.renderer_alt \
             if highlighted else self.renderer_default
 
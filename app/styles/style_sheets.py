@@ -1,9 +1,9 @@
 import os
 import sys
 from abc import ABC
+from typing import Any
 
-from app.objects import Annotation
-from app.utils import text_to_color
+from PyQt6.QtWidgets import QWidget
 
 __basepath__ = sys._MEIPASS if hasattr(sys, '_MEIPASS') else '.'
 __iconpath__ = os.path.join(__basepath__, 'resources', 'icons')
@@ -27,38 +27,6 @@ class LabelStyleSheet(StyleSheet):
         """
 
 
-class CheckBoxStyleSheet(StyleSheet):
-    def __init__(self, annotation: Annotation) -> None:
-        super().__init__()
-
-        anno_color = text_to_color(annotation.label_name)
-
-        text_color, anno_color = ((200, 200, 200), (*anno_color, 1)) \
-            if annotation.visible else ((117, 117, 117), (*anno_color, 0.5))
-
-        underline = 'rgba(255, 255, 255, 0.85)' \
-            if annotation.selected else 'transparent'
-
-        self.style_sheet = f"""
-            QCheckBox {{
-                color: rgb{text_color};
-                border-bottom: 1px solid {underline};
-                background-color: transparent;
-                font-weight: bold;
-                margin-right: 24px;
-                padding: 2px 0px;
-            }}
-
-            ::indicator {{
-                background-color: rgba{anno_color};
-                border-radius: 1px;
-                margin-top: 1px;
-                height: 14px;
-                width: 2px;
-            }}
-        """
-
-
 class SettingCheckBoxStyleSheet(StyleSheet):
     def __init__(self, hovered: bool, selected: bool) -> None:
         super().__init__()
@@ -73,3 +41,23 @@ class SettingCheckBoxStyleSheet(StyleSheet):
                 border: 1px solid rgb{outline};
             }}
         """
+
+
+def set_style_property(widget: QWidget, name: str, value: Any) -> None:
+    """Set a dynamic property matched by app.qss and repolish the widget.
+
+    Unlike `setStyleSheet`, this reuses the already parsed application
+    style sheet, and does nothing if the property is unchanged.
+    """
+    if widget.property(name) == value:
+        return
+
+    widget.setProperty(name, value)
+
+    widget.style().unpolish(widget)
+    widget.style().polish(widget)
+
+
+def set_style_sheet(widget: QWidget, style_sheet: str) -> None:
+    if widget.styleSheet() != style_sheet:
+        widget.setStyleSheet(style_sheet)
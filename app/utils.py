@@ -1,14 +1,28 @@
 import hashlib
+import re
+import threading
+from functools import lru_cache
+from typing import Iterable
 
-import enchant
-
-us_dict = enchant.Dict('en_US')
+__dictionary_lock__ = threading.Lock()
 
 
 def clip_value(value: float, mininum: float, maximum: float) -> int | float:
     return min(max(value, mininum), maximum)
 
 
+def parse_range(text: str) -> tuple[int, int] | None:
+    """Parse an inclusive range of positive integers, written as `i-j`,
+    `i..j` or a single number."""
+    match = re.fullmatch(r'\s*(\d+)\s*(?:(?:-|\.\.)\s*(\d+)\s*)?', text)
+
+    if match is None:
+        return None
+
+    first, last = int(match.group(1)), int(match.group(2) or match.group(1))
+    return min(first, last), max(first, last)
+
+
 def text_to_color(text: str) -> tuple[int, int, int]:
     hash_code = int(hashlib.sha256(text.encode('utf-8')).hexdigest(), 16)
 
@@ -19,9 +33,27 @@ def text_to_color(text: str) -> tuple[int, int, int]:
     return red, green, blue
 
 
+@lru_cache(maxsize=None)
+def _get_dictionary() -> 'enchant.Dict':
+    import enchant
+
+    return enchant.Dict('en_US')
+
+
+def _is_word(word: str) -> bool:
+    with __dictionary_lock__:
+        return _get_dictionary().check(word)
+
+
+@lru_cache(maxsize=65536)
 def pretty_text(text: str) -> str:
     words = text.replace('_', ' ').replace('-', ' ').split(' ')
-    words = [word.capitalize() if us_dict.check(word) else word.upper()
+    words = [word.capitalize() if _is_word(word) else word.upper()
              for word in words]
 
     return ' '.join(words)
+
+
+def cache_pretty_text(texts: Iterable[str]) -> None:
+    for text in texts:
+        pretty_text(text)
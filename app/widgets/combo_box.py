@@ -1,9 +1,8 @@
+import heapq
 from typing import TYPE_CHECKING, Callable
 
-import rapidfuzz
-from rapidfuzz.fuzz import partial_ratio
-from PyQt6.QtCore import Qt, QObject, QEvent
-from PyQt6.QtGui import QKeyEvent
+from PyQt6.QtCore import Qt, QObject, QEvent, QThreadPool
+from PyQt6.QtGui import QKeyEvent, QHideEvent
 from PyQt6.QtWidgets import (
     QWidget,
     QWidgetAction,
@@ -13,10 +12,19 @@ from PyQt6.QtWidgets import (
     QLineEdit
 )
 
+from app.handlers.search import (
+    AnnotationManifest,
+    ImageQuery,
+    SearchJob,
+    SearchSignals,
+    SearchWorker
+)
+from app.styles.style_sheets import set_style_property, set_style_sheet
 from app.utils import clip_value, pretty_text, text_to_color
 
 if TYPE_CHECKING:
     from app.canvas import Canvas
+    from app.controllers.image_controller import ImageSearchIndex
 
 __windowtype__ = Qt.WindowType.FramelessWindowHint
 __background__ = Qt.WidgetAttribute.WA_TranslucentBackground
@@ -121,15 +129,13 @@ class AnnotationComboBox(ComboBox):
 
         super().__init__(parent, labels, 'Category', get_num_labels)
 
-    def _sort_labels(self, target: str) -> list[str]:
-        target = target.lower().replace(' ', '_')
-
-        matches = rapidfuzz.process.extract(target,
-                                            self.options,
-                                            scorer=partial_ratio,
-                                            limit=self.num_results)
+        self.matcher = parent.label_map.matcher
+        self.label_options = self.matcher.get_options(labels)
 
-        return [match[0] for match in matches]
+    def _sort_labels(self, target: str) -> list[str]:
+        return self.matcher.extract(target,
+                                    self.label_options,
+                                    self.num_results)
 
     def _on_text_changed(self) -> None:
         target = self.text_widget.text()
@@ -169,20 +175,28 @@ class AnnotationComboBox(ComboBox):
             self.label_widgets[0].setText('<i>No labels available</i>')
             return
 
-        selected_text = self.labels_filtered[self.selected_index]
-        underline_color = text_to_color(selected_text)
+        for index, (widget, label) in enumerate(
+                zip(self.label_widgets, self.labels_filtered)):
+            underline = f'2px solid rgb{text_to_color(label)}' \
+                if index == self.selected_index else 'none'
 
-        for widget, label in zip(self.label_widgets, self.labels_filtered):
-            widget.setStyleSheet('border: none; border-bottom: none;')
+            set_style_sheet(widget,
+                            f'border: none; border-bottom: {underline};')
             widget.setText(pretty_text(label))
 
-        self.label_widgets[self.selected_index].setStyleSheet(
-            f'border: none; border-bottom: 2px solid rgb{underline_color};')
-
 
 class ImageComboBox(ComboBox):
-    def __init__(self, parent: 'Canvas', image_names: list[str]) -> None:
-        super().__init__(parent, image_names, 'Find image by name', lambda: 5)
+    def __init__(self,
+                 parent: 'Canvas',
+                 search_index: 'ImageSearchIndex',
+                 manifest: AnnotationManifest
+                 ) -> None:
+        super().__init__(parent, search_index.names,
+                         'Find image by name', lambda: 5)
+
+        self.search_index = search_index
+        self.manifest = manifest
+        self._job = None
 
         self._set_width()
         self._on_text_changed()
@@ -193,22 +207,62 @@ class ImageComboBox(ComboBox):
         label_widget = self.label_widgets[0]
         text_length = label_widget.fontMetrics().horizontalAdvance
 
-        label_widget.setText(max(self.options, key=text_length))
+        # Only measure the longest names rather than every image name
+        longest_names = heapq.nlargest(16, self.options, key=len)
+        label_widget.setText(max(longest_names, key=text_length))
         label_widget.adjustSize()
 
         label_widget.setFixedWidth(self.label_widgets[0].width() + 75)
 
+    def _cancel_search(self) -> None:
+        if self._job is not None:
+            self._job.cancelled = True
+            self._job = None
+
     def _on_text_changed(self) -> None:
-        search = self.text_widget.text()
-        filtered_names = [name for name in self.options if search in name]
+        query = ImageQuery.parse(self.text_widget.text())
+
+        self._cancel_search()
+        self.selected_index = 0
+
+        if query.is_plain:
+            indices = self.search_index.search(query.text, self.num_results)
+            self._show_results(indices, True)
+
+            return
+
+        self._job = SearchJob(query, self.options,
+                              self.manifest, self.num_results)
+
+        signals = SearchSignals()
+        signals.results.connect(self._on_results)
+
+        QThreadPool.globalInstance().start(SearchWorker(self._job, signals))
+        self._show_results([], False)
+
+    def _on_results(self,
+                    job: SearchJob,
+                    indices: list[int],
+                    finished: bool
+                    ) -> None:
+        if job is self._job:
+            self._show_results(indices, finished)
+
+    def _show_results(self, indices: list[int], finished: bool) -> None:
+        self.labels_filtered = [self.options[index] for index in indices]
 
         for widget in self.widgets:
             widget.setText('')
 
-        for index, name in enumerate(filtered_names[:self.num_results]):
-            self.widgets[index].setText(name)
+        for widget, name in zip(self.widgets, self.labels_filtered):
+            widget.setText(name)
 
-        self.selected_index = 0
+        if not self.labels_filtered:
+            self.widgets[0].setText('<i>No images found</i>' if finished
+                                    else '<i>Searching...</i>')
+
+        self.selected_index = clip_value(
+            self.selected_index, 0, max(len(self.labels_filtered) - 1, 0))
         self.update()
 
     def _on_key_press(self, event: QKeyEvent) -> None:
@@ -216,7 +270,7 @@ class ImageComboBox(ComboBox):
             index = (-1 if event.key() == Qt.Key.Key_Up else 1) \
                 + self.selected_index
 
-            if 0 <= index < len(self.widgets) and self.widgets[index].text():
+            if 0 <= index < len(self.labels_filtered):
                 self.selected_index = index
 
         elif event.key() == Qt.Key.Key_Escape:
@@ -225,19 +279,25 @@ class ImageComboBox(ComboBox):
         self.update()
 
     def _on_mouse_hover(self, widget: QWidget) -> None:
-        if not (isinstance(widget, QLabel) and widget.text()):
+        if not isinstance(widget, QLabel) \
+                or self.widgets.index(widget) >= len(self.labels_filtered):
             return
 
         self.selected_index = self.widgets.index(widget)
         self.update()
 
     def _select(self) -> None:
-        self.selected_value = self.widgets[self.selected_index].text()
+        if not self.labels_filtered:
+            return
+
+        self.selected_value = self.labels_filtered[self.selected_index]
         self.close()
 
+    def hideEvent(self, event: QHideEvent) -> None:
+        self._cancel_search()
+        super().hideEvent(event)
+
     def update(self) -> None:
         for index, widget in enumerate(self.widgets):
-            color = (255, 255, 255) if index == self.selected_index \
-                else (200, 200, 200)
-
-            widget.setStyleSheet(f'color: rgb{color};')
+            set_style_property(widget, 'selected',
+                               index == self.selected_index)
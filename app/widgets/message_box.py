@@ -16,6 +16,12 @@ __confirm_import__ = ('You already have existing annotations in this session. '
 __confirm_export__ = ('Your annotations will be automatically saved, but '
                       'have not been exported yet.\n\nExport before leaving?')
 
+__confirm_edit_categories__ = ('{num_annos} annotations in {num_images} '
+                               'images will be {change}.\n\nThe edit can be '
+                               'undone from this image, but the undo history '
+                               'of the other images it changes will be '
+                               'discarded. Continue?')
+
 __import_fail__ = ('The contents of this file have already '
                    'been imported into this session.')
 
@@ -78,6 +84,19 @@ class ConfirmExitBox(MessageBox):
                          'icon:export.png',)
 
 
+class ConfirmEditCategoriesBox(MessageBox):
+    def __init__(self,
+                 parent: 'MainWindow',
+                 num_annos: int,
+                 num_images: int,
+                 change: str
+                 ) -> None:
+        message = __confirm_edit_categories__.format(
+            num_annos=num_annos, num_images=num_images, change=change)
+
+        super().__init__(parent, 'Confirm Edit', message, False)
+
+
 class ImportFailedBox(InformationBox):
     def __init__(self, parent: 'MainWindow') -> None:
         super().__init__(parent, 'Can\'t Import File', __import_fail__)
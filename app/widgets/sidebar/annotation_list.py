@@ -1,32 +1,43 @@
 import os
 import sys
+from dataclasses import dataclass, replace
 from typing import TYPE_CHECKING
 
-from PyQt6.QtCore import Qt, QObject, QEvent
+from PyQt6.QtCore import (
+    Qt,
+    QModelIndex,
+    QPersistentModelIndex,
+    QTimer,
+    QRect,
+    QSize
+)
 from PyQt6.QtGui import (
     QGuiApplication,
     QMouseEvent,
     QShowEvent,
-    QResizeEvent,
     QFontMetrics,
-    QPixmap
+    QPainter,
+    QPixmap,
+    QColor,
+    QFont
 )
 from PyQt6.QtWidgets import (
-    QGraphicsOpacityEffect,
-    QStyleOptionButton,
-    QHBoxLayout,
+    QStyleOptionViewItem,
+    QStyledItemDelegate,
+    QAbstractItemView,
+    QSizePolicy,
     QVBoxLayout,
+    QTreeView,
     QWidget,
-    QCheckBox,
-    QLabel,
-    QStyle
+    QLabel
 )
 
 from app.enums.annotation import VisibilityType
 from app.enums.canvas import AnnotatingState
+from app.handlers.actions import AnnotationDelta
 from app.objects import Annotation, Keypoint
-from app.styles.style_sheets import CheckBoxStyleSheet
-from app.utils import pretty_text
+from app.utils import text_to_color
+from app.widgets.sidebar.annotation_model import AnnotationModel
 from app.widgets.sidebar.collapsible_section import CollapsibleSection
 from app.widgets.sidebar.control_panel import ControlPanel
 from app.widgets.tooltip import Tooltip
@@ -39,6 +50,20 @@ __basepath__ = sys._MEIPASS if hasattr(sys, '_MEIPASS') else '.'
 __iconpath__ = os.path.join(__basepath__, 'resources', 'icons')
 
 __smooth_transform__ = Qt.TransformationMode.SmoothTransformation
+__text_alignment__ = (Qt.AlignmentFlag.AlignLeft |
+                      Qt.AlignmentFlag.AlignVCenter)
+
+__max_delta_size__ = 64
+
+
+@dataclass(frozen=True)
+class SidebarState:
+    """What the sidebar shows of the canvas state, besides the rows."""
+
+    selected_annos: tuple[tuple[str, VisibilityType], ...]
+    selected_keypoints: tuple[tuple[str, int, bool], ...]
+    annotator: tuple[bool, int]
+    keypoints_hidden: bool
 
 
 class AnnotationList(QWidget):
@@ -46,14 +71,23 @@ class AnnotationList(QWidget):
         super().__init__(parent)
         self.parent = parent
 
+        refresh_rate = QGuiApplication.primaryScreen().refreshRate() or 60
+        self._refresh_timer = QTimer(self, singleShot=True,
+                                     interval=int(1000 / refresh_rate))
+        self._refresh_timer.timeout.connect(self.refresh)
+        self._state = None
+
         self.empty_banner = EmptyBanner()
         self.control_panel = ControlPanel(self)
 
         self.anno_section = CollapsibleSection('Annotations', False)
         self.hidden_section = CollapsibleSection('Hidden', True)
 
-        self.anno_layout = self.anno_section.content_layout
-        self.hidden_layout = self.hidden_section.content_layout
+        self.anno_view = AnnotationView(parent.canvas, False)
+        self.hidden_view = AnnotationView(parent.canvas, True)
+
+        self.anno_section.content_layout.addWidget(self.anno_view)
+        self.hidden_section.content_layout.addWidget(self.hidden_view)
 
         main_layout = QVBoxLayout(self)
         main_layout.setContentsMargins(0, 0, 0, 0)
@@ -68,61 +102,158 @@ class AnnotationList(QWidget):
         self.setAttribute(Qt.WidgetAttribute.WA_StyledBackground, True)
 
     @property
-    def list_items(self) -> list['ListItem']:
-        return self.findChildren(ListItem)
-
-    def redraw_widgets(self) -> None:
-        for list_item in self.list_items:
-            (list_item.hide(), list_item.deleteLater())
+    def annotations(self) -> list[Annotation]:
+        return self.anno_view.model().annotations
 
-        visibility_handler = self.parent.canvas.visibility_handler
+    def _get_annotations(self) -> list[Annotation]:
         annotator = self.parent.canvas.keypoint_annotator
         annos = self.parent.canvas.annotations.copy()
 
         if annotator.active and annotator.annotation not in annos:
             annos.append(annotator.annotation)
 
-        sorted_annos = self._sort(annos)
-        num_visible, num_hidden = 0, 0
+        return annos
 
-        for anno in sorted_annos:
-            list_item = ListItem(self.parent.canvas, anno)
+    def _split(self,
+               entries: list[tuple[tuple, Annotation]]
+               ) -> tuple[list, list]:
+        visibility_handler = self.parent.canvas.visibility_handler
+        visible_entries, hidden_entries = [], []
 
-            if visibility_handler.interactable(anno):
-                self.anno_layout.addWidget(list_item)
-                list_item.set_hidden(False)
-                num_visible += 1
+        for entry in entries:
+            section_entries = visible_entries \
+                if visibility_handler.interactable(entry[1]) \
+                else hidden_entries
 
-            else:
-                self.hidden_layout.addWidget(list_item)
-                list_item.set_hidden(True)
-                num_hidden += 1
+            section_entries.append(entry)
 
-        self.anno_section.setVisible(bool(annos))
+        return visible_entries, hidden_entries
+
+    def _update_sections(self) -> None:
+        num_visible = self.anno_view.model().rowCount()
+        num_hidden = self.hidden_view.model().rowCount()
+
+        self.anno_section.setVisible(bool(num_visible + num_hidden))
         self.anno_section.set_count(num_visible)
 
         self.hidden_section.setVisible(bool(num_hidden))
         self.hidden_section.set_count(num_hidden)
 
-        self.empty_banner.setHidden(bool(annos))
+        self.empty_banner.setHidden(bool(num_visible + num_hidden))
         self.control_panel.redraw()
 
-    def _sort(self, annotations: list[Annotation]) -> list[Annotation]:
+        self.refresh()
+
+    def redraw_widgets(self) -> None:
+        entries = self._sort(self._get_annotations())
+        visible_entries, hidden_entries = self._split(entries)
+
+        self.anno_view.set_annotations(visible_entries)
+        self.hidden_view.set_annotations(hidden_entries)
+
+        self._update_sections()
+
+    def apply_delta(self, delta: AnnotationDelta) -> None:
+        """Update only the rows of the annotations affected by an action."""
+        ref_ids = delta.ref_ids
+
+        if len(ref_ids) > __max_delta_size__:
+            self.redraw_widgets()
+            return
+
+        annos = [anno for anno in self._get_annotations()
+                 if anno.ref_id in ref_ids]
+        visible_entries, hidden_entries = self._split(self._sort(annos))
+
+        self.anno_view.update_annotations(ref_ids, visible_entries)
+        self.hidden_view.update_annotations(ref_ids, hidden_entries)
+
+        self._update_sections()
+
+    def _sort(self,
+              annotations: list[Annotation]
+              ) -> list[tuple[tuple, Annotation]]:
         label_map = self.parent.label_map_controller
 
         def _get_id(anno: Annotation) -> int:
             return label_map.get_id(anno.label_name) \
                 if label_map.contains(anno.label_name) else float('inf')
 
-        return sorted(annotations, key=lambda anno: (
-            _get_id(anno), anno.label_name, anno.ref_id))
+        return sorted((((_get_id(anno), anno.label_name, anno.ref_id), anno)
+                       for anno in annotations), key=lambda entry: entry[0])
+
+    def _get_expanded_annotation(self) -> Annotation | None:
+        canvas = self.parent.canvas
+        selected_annos = canvas.selected_annos
+        selected_kpts = canvas.selected_keypoints
+
+        if canvas.keypoints_hidden:
+            return None
+
+        if selected_kpts:
+            anno = selected_kpts[0].parent
+
+            if not all(kpt.parent == anno for kpt in selected_kpts):
+                return None
+
+        elif len(selected_annos) == 1:
+            anno = selected_annos[0]
+
+        else:
+            return None
+
+        return anno if anno.visible == VisibilityType.VISIBLE else None
+
+    def _get_state(self) -> SidebarState:
+        canvas = self.parent.canvas
+        annotator = canvas.keypoint_annotator
+
+        return SidebarState(
+            selected_annos=tuple((anno.ref_id, anno.visible)
+                                 for anno in canvas.selected_annos),
+            selected_keypoints=tuple(
+                (kpt.parent.ref_id, kpt.index, kpt.visible)
+                for kpt in canvas.selected_keypoints),
+            annotator=(annotator.active, annotator.label_index),
+            keypoints_hidden=canvas.keypoints_hidden)
+
+    def refresh(self) -> None:
+        """Repaint what changed in the sidebar since the last refresh.
+
+        A change of selected annotations only repaints their own rows,
+        anything else repaints the rows in view.
+        """
+        self._refresh_timer.stop()
+
+        state, prev_state = self._get_state(), self._state
+        self._state = state
+
+        expanded_anno = self._get_expanded_annotation()
+
+        for view in self.anno_view, self.hidden_view:
+            view.set_expanded_annotation(expanded_anno)
+
+        if prev_state is not None and replace(state, selected_annos=()) \
+                == replace(prev_state, selected_annos=()):
+            changed = set(state.selected_annos) ^ set(prev_state.selected_annos)
+            ref_ids = {ref_id for ref_id, _ in changed}
+
+            for view in self.anno_view, self.hidden_view:
+                view.update_rows(ref_ids)
+
+            return
+
+        for view in self.anno_view, self.hidden_view:
+            view.viewport().update()
 
     def update(self) -> None:
-        for list_item in self.list_items:
-            list_item.update()
+        """Refresh the sidebar at most once per frame."""
+        if not self._refresh_timer.isActive():
+            self._refresh_timer.start()
 
     def showEvent(self, event: QShowEvent) -> None:
-        self.update()
+        self._state = None
+        self.refresh()
 
     def mousePressEvent(self, event: QMouseEvent) -> None:
         if self.parent.canvas.keypoint_annotator.active:
@@ -153,253 +284,342 @@ class EmptyBanner(QWidget):
         self.layout.setSpacing(12)
 
 
-class AnnotationCheckBox(QCheckBox):
-    def __init__(self, parent: 'Canvas', annotation: 'Annotation') -> None:
+class AnnotationView(QTreeView):
+    """Lists annotations and the keypoints of the expanded annotation.
+
+    Rows are painted by `AnnotationDelegate` rather than being backed by
+    widgets, so only the rows in view cost anything to draw. The view of
+    hidden annotations is faded and does not respond to the mouse.
+    """
+
+    def __init__(self, canvas: 'Canvas', faded: bool) -> None:
         super().__init__()
 
-        self.parent = parent
-        self.annotation = annotation
-        self.is_elided = False
+        self.canvas = canvas
+        self.faded = faded
 
-    def _elide_text(self, text: str) -> str:
-        option = QStyleOptionButton()
-        option.rect = self.contentsRect()
+        self.hovered = None
+        self._expanded = QPersistentModelIndex()
 
-        text_rect = self.style().subElementRect(
-            QStyle.SubElement.SE_CheckBoxContents, option, self)
+        self.delegate = AnnotationDelegate(self)
+        self.tooltip = Tooltip(self.viewport(), 1200)
+        self.tooltip.disable()
 
-        return QFontMetrics(self.font()).elidedText(
-            text, Qt.TextElideMode.ElideRight, text_rect.width())
+        self.setModel(AnnotationModel())
+        self.setItemDelegate(self.delegate)
 
-    def on_mouse_enter(self) -> None:
-        self.annotation.highlighted = True
-        self.parent.update()
+        self.setHeaderHidden(True)
+        self.setIndentation(0)
+        self.setRootIsDecorated(False)
+        self.setItemsExpandable(False)
+        self.setExpandsOnDoubleClick(False)
 
-    def on_mouse_leave(self) -> None:
-        self.annotation.highlighted = False
-        self.parent.update()
+        self.setFocusPolicy(Qt.FocusPolicy.NoFocus)
+        self.setFrameShape(QTreeView.Shape.NoFrame)
+        self.setSelectionMode(QAbstractItemView.SelectionMode.NoSelection)
+        self.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.setHorizontalScrollBarPolicy(
+            Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
 
-    def on_left_click(self) -> None:
-        if self.annotation.selected:
-            self.parent.unselect_annotation(self.annotation)
-        else:
-            self.parent.add_selected_annotation(self.annotation)
+        self.setSizePolicy(QSizePolicy.Policy.Preferred,
+                           QSizePolicy.Policy.Preferred)
 
-        self.parent.update()
+        self.setMouseTracking(True)
+        self.viewport().setMouseTracking(True)
 
-    def on_right_click(self) -> None:
-        shift_pressed = Qt.KeyboardModifier.ShiftModifier \
-                        & QGuiApplication.keyboardModifiers()
+    def set_annotations(self, entries: list[tuple[tuple, Annotation]]) -> None:
+        self.model().set_annotations(entries)
+        self.updateGeometry()
 
-        if self.annotation.visible == VisibilityType.VISIBLE:
-            self.annotation.visible = VisibilityType.HIDDEN
+    def update_annotations(self,
+                           ref_ids: set[str],
+                           entries: list[tuple[tuple, Annotation]]
+                           ) -> None:
+        self.model().update_annotations(ref_ids, entries)
+        self.updateGeometry()
 
-            if shift_pressed and self.annotation.has_bbox:
-                self.annotation.visible = VisibilityType.BOX_ONLY
+    def update_rows(self, ref_ids: set[str]) -> None:
+        for ref_id in ref_ids:
+            index = self.model().index_of_ref_id(ref_id)
 
-        else:
-            self.annotation.visible = VisibilityType.VISIBLE
+            if index.isValid():
+                self.update(index)
 
-        self.parent.update()
+    def set_expanded_annotation(self, annotation: Annotation | None) -> None:
+        index = self.model().index_of(annotation) \
+            if annotation is not None else QModelIndex()
 
-    def resizeEvent(self, event: QResizeEvent) -> None:
-        base_text = pretty_text(self.annotation.label_name)
-        elided_text = self._elide_text(base_text)
+        if index == QModelIndex(self._expanded) \
+                and (not index.isValid() or self.isExpanded(index)):
+            return
 
-        self.is_elided = base_text != elided_text
-        self.setText(elided_text)
+        if self._expanded.isValid():
+            self.collapse(QModelIndex(self._expanded))
 
-    def mousePressEvent(self, event: QMouseEvent) -> None:
-        if Qt.MouseButton.LeftButton & event.button():
-            self.on_left_click()
+        if index.isValid():
+            self.expand(index)
 
-        elif Qt.MouseButton.RightButton & event.button():
-            self.on_right_click()
+        self._expanded = QPersistentModelIndex(index)
+        self.updateGeometry()
 
-    def update(self) -> None:
-        self.setStyleSheet(str(CheckBoxStyleSheet(self.annotation)))
+    def _set_hovered(self, hovered: Annotation | Keypoint | None) -> None:
+        if hovered is self.hovered:
+            return
 
+        if isinstance(self.hovered, Annotation):
+            self.hovered.highlighted = False
 
-class ListItem(QWidget):
-    def __init__(self, canvas: 'Canvas', annotation: Annotation) -> None:
-        super().__init__()
+        elif isinstance(self.hovered, Keypoint):
+            self.hovered.hovered = False
 
-        self.canvas = canvas
-        self.annotation = annotation
+        if isinstance(hovered, Annotation):
+            hovered.highlighted = True
 
-        self.checkbox = AnnotationCheckBox(self.canvas, self.annotation)
-        self.keypoint_list = KeypointList(self, annotation)
+        elif isinstance(hovered, Keypoint):
+            hovered.hovered = True
 
-        self.arrow = QLabel()
-        self.arrow.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.hovered = hovered
+        self._update_tooltip()
 
-        header = QWidget(self)
-        header.installEventFilter(self)
+        self.canvas.update()
+        self.viewport().update()
 
-        tooltip_text = pretty_text(annotation.label_name)
-        self.tooltip = Tooltip(header, 1200, tooltip_text)
+    def _update_tooltip(self) -> None:
+        if not isinstance(self.hovered, Annotation):
+            self.tooltip.disable()
+            self.tooltip.hide()
 
-        self.layout = QVBoxLayout()
-        self.layout.addWidget(header)
-        self.layout.addWidget(self.keypoint_list)
+            return
 
-        self.header_layout = QHBoxLayout()
-        self.header_layout.addWidget(self.checkbox)
-        self.header_layout.addWidget(self.arrow)
+        index = self.model().index_of(self.hovered)
+        text = self.model().text(index)
 
-        header.setLayout(self.header_layout)
-        self.setLayout(self.layout)
+        if self.delegate.is_elided(text, self.visualRect(index)):
+            self.tooltip.setText(text)
+            self.tooltip.enable()
+            self.tooltip.restart()
+
+        else:
+            self.tooltip.disable()
+            self.tooltip.hide()
+
+    def _get_object_at(self, index: QModelIndex) -> Annotation | Keypoint:
+        keypoint = self.model().keypoint(index)
+
+        return keypoint if keypoint is not None \
+            else self.model().annotation(index)
 
-        self.layout.setContentsMargins(0, 0, 0, 0)
-        self.layout.setSpacing(0)
+    def on_annotation_press(self,
+                            annotation: Annotation,
+                            event: QMouseEvent
+                            ) -> None:
+        if self.canvas.keypoint_annotator.active:
+            self.canvas.keypoint_annotator.end()
+            annotation.highlighted = False
+
+        if Qt.MouseButton.LeftButton & event.button():
+            if annotation.selected:
+                self.canvas.unselect_annotation(annotation)
+            else:
+                self.canvas.add_selected_annotation(annotation)
 
-        self.header_layout.setContentsMargins(11, 9, 7, 9)
+        elif Qt.MouseButton.RightButton & event.button():
+            shift_pressed = Qt.KeyboardModifier.ShiftModifier \
+                            & QGuiApplication.keyboardModifiers()
 
-        self.update()
+            if annotation.visible == VisibilityType.VISIBLE:
+                annotation.visible = VisibilityType.HIDDEN
 
-    def set_hidden(self, hidden: bool) -> None:
-        fade_effect = QGraphicsOpacityEffect()
-        fade_effect.setOpacity(0.5)
+                if shift_pressed and annotation.has_bbox:
+                    annotation.visible = VisibilityType.BOX_ONLY
 
-        self.setGraphicsEffect(fade_effect if hidden else None)
-        self.setEnabled(not hidden)
+            else:
+                annotation.visible = VisibilityType.VISIBLE
 
-    def eventFilter(self, source: QObject, event: QEvent) -> bool:
-        if event.type() in (event.Type.MouseButtonPress,
-                            event.Type.MouseButtonDblClick):
-            if not self.isEnabled():
-                return True
+        self.canvas.update()
+        self.viewport().update()
 
+    def on_keypoint_press(self,
+                          keypoint: Keypoint,
+                          event: QMouseEvent
+                          ) -> None:
+        if keypoint.visible:
             if self.canvas.keypoint_annotator.active:
                 self.canvas.keypoint_annotator.end()
-                self.checkbox.on_mouse_leave()
 
-            self.checkbox.mousePressEvent(event)
+            self.canvas.on_keypoint_left_press(keypoint, event)
+            self.canvas.update()
 
-        elif event.type() == event.Type.Enter:
-            source.setStyleSheet('background-color: rgb(53, 53, 53);')
-            self.checkbox.on_mouse_enter()
+        else:
+            if not self.canvas.keypoint_annotator.active:
+                self.canvas.set_annotating_state(
+                    AnnotatingState.DRAWING_KEYPOINTS)
 
-        elif event.type() == event.Type.Leave:
-            source.setStyleSheet('background-color: transparent;')
-            self.checkbox.on_mouse_leave()
+            self.canvas.keypoint_annotator.set_index(keypoint.index)
 
-        return True
+    def mousePressEvent(self, event: QMouseEvent) -> None:
+        if self.faded:
+            return
 
-    def update(self) -> None:
-        anno = self.annotation
-        selected_annos = self.canvas.selected_annos
-        selected_kpts = self.canvas.selected_keypoints
-        hide_keypoints = self.canvas.keypoints_hidden
+        index = self.indexAt(event.position().toPoint())
+        self.tooltip.hide()
 
-        self.keypoint_list.update()
-        self.checkbox.update()
+        if not index.isValid():
+            if self.canvas.keypoint_annotator.active:
+                self.canvas.keypoint_annotator.end()
 
-        if hide_keypoints or anno.visible != VisibilityType.VISIBLE:
-            arrow_color = 117, 117, 117
-            show_kpt_list = False
+        elif index.internalPointer() is None:
+            self.on_annotation_press(self.model().annotation(index), event)
 
         else:
-            arrow_color = 200, 200, 200
-            show_kpt_list = bool(selected_kpts) or selected_annos == [anno]
-            show_kpt_list &= all(kpt.parent == anno for kpt in selected_kpts)
+            self.on_keypoint_press(self.model().keypoint(index), event)
 
-        self.arrow.setStyleSheet(f'color: rgb{arrow_color}; padding: 0px;')
-        self.arrow.setText('\u276E' if show_kpt_list else '\u276F')
-        self.arrow.setVisible(bool(anno.kpt_names))
+    def mouseDoubleClickEvent(self, event: QMouseEvent) -> None:
+        self.mousePressEvent(event)
 
-        if self.keypoint_list.isVisible() != show_kpt_list:
-            self.keypoint_list.setVisible(show_kpt_list)
+    def mouseMoveEvent(self, event: QMouseEvent) -> None:
+        if self.faded:
+            return
 
-        self.tooltip.enable() if self.checkbox.is_elided \
-            else self.tooltip.disable()
+        index = self.indexAt(event.position().toPoint())
+        self._set_hovered(self._get_object_at(index))
 
+    def mouseReleaseEvent(self, event: QMouseEvent) -> None:
+        pass
 
-class KeypointList(QWidget):
-    def __init__(self, parent: ListItem, annotation: Annotation) -> None:
-        super().__init__()
+    def leaveEvent(self, event) -> None:
+        self._set_hovered(None)
 
-        self.hide()
-        self.parent = parent
-        self.annotation = annotation
+    def sizeHint(self) -> QSize:
+        height = self.model().rowCount() * self.delegate.anno_height
 
-        layout = QVBoxLayout(self)
-        for keypoint in annotation.keypoints:
-            layout.addWidget(KeypointItem(self.parent, keypoint))
+        if self._expanded.isValid():
+            num_keypoints = self.model().rowCount(QModelIndex(self._expanded))
+            height += num_keypoints * self.delegate.keypoint_height
 
-        layout.setContentsMargins(0, 0, 0, 0)
-        layout.setSpacing(0)
+        return QSize(super().sizeHint().width(), height)
 
-    def update(self) -> None:
-        for keypoint_item in self.findChildren(KeypointItem):
-            keypoint_item.update()
 
+class AnnotationDelegate(QStyledItemDelegate):
+    anno_height = 38
+    keypoint_height = 25
 
-class KeypointItem(QWidget):
-    def __init__(self, parent: ListItem, keypoint: Keypoint) -> None:
-        super().__init__()
+    def __init__(self, parent: AnnotationView) -> None:
+        super().__init__(parent)
+        self.view = parent
 
-        self.parent = parent
-        self.keypoint = keypoint
+    def _get_font(self) -> QFont:
+        font = QFont(self.view.font())
+        font.setBold(True)
 
-        keypoint_name = keypoint.parent.kpt_names[keypoint.index]
-        self.keypoint_label = QLabel(pretty_text(keypoint_name))
-        self.installEventFilter(self)
+        return font
 
-        self.setLayout(QHBoxLayout())
-        self.layout().addWidget(self.keypoint_label)
-        self.layout().setContentsMargins(0, 0, 0, 0)
+    @staticmethod
+    def _get_text_rect(rect: QRect) -> QRect:
+        return rect.adjusted(20, 0, -38, 0)
 
-    def on_mouse_press(self, event: QMouseEvent) -> None:
-        canvas = self.parent.canvas
+    def is_elided(self, text: str, rect: QRect) -> bool:
+        metrics = QFontMetrics(self._get_font())
+        text_width = self._get_text_rect(rect).width()
+
+        return metrics.horizontalAdvance(text) > text_width
+
+    def sizeHint(self,
+                 option: QStyleOptionViewItem,
+                 index: QModelIndex
+                 ) -> QSize:
+        height = self.anno_height if index.internalPointer() is None \
+            else self.keypoint_height
+
+        return QSize(option.rect.width(), height)
 
-        if self.keypoint.visible:
-            if canvas.keypoint_annotator.active:
-                canvas.keypoint_annotator.end()
+    def paint(self,
+              painter: QPainter,
+              option: QStyleOptionViewItem,
+              index: QModelIndex
+              ) -> None:
+        painter.save()
+        painter.setFont(self._get_font())
 
-            canvas.on_keypoint_left_press(self.keypoint, event)
-            canvas.update()
+        if self.view.faded:
+            painter.setOpacity(0.5)
 
+        if index.internalPointer() is None:
+            self._paint_annotation(painter, option, index)
         else:
-            if not canvas.keypoint_annotator.active:
-                canvas.set_annotating_state(
-                    AnnotatingState.DRAWING_KEYPOINTS)
+            self._paint_keypoint(painter, option, index)
 
-            canvas.keypoint_annotator.set_index(self.keypoint.index)
+        painter.restore()
 
-    def eventFilter(self, source: QObject, event: QEvent) -> bool:
-        if event.type() in (event.Type.MouseButtonPress,
-                            event.Type.MouseButtonDblClick):
-            self.on_mouse_press(event)
-            return True
+    def _paint_annotation(self,
+                          painter: QPainter,
+                          option: QStyleOptionViewItem,
+                          index: QModelIndex
+                          ) -> None:
+        anno = index.model().annotation(index)
+        canvas = self.view.canvas
+        rect = option.rect
 
-        elif event.type() == event.Type.Enter:
-            self.keypoint.hovered = True
-            self.parent.canvas.update()
-            self.update()
+        if self.view.hovered is anno:
+            painter.fillRect(rect, QColor(53, 53, 53))
 
-        elif event.type() == event.Type.Leave:
-            self.keypoint.hovered = False
-            self.parent.canvas.update()
-            self.update()
+        text_color, alpha = ((200, 200, 200), 255) if anno.visible \
+            else ((117, 117, 117), 128)
 
-        return False
+        indicator = QRect(rect.left() + 11, rect.center().y() - 7, 2, 14)
+        painter.fillRect(indicator, QColor(*text_to_color(anno.label_name),
+                                           alpha))
 
-    def update(self) -> None:
-        if self.keypoint not in self.keypoint.parent.keypoints:
+        text_rect = self._get_text_rect(rect)
+        text = painter.fontMetrics().elidedText(
+            index.model().text(index),
+            Qt.TextElideMode.ElideRight,
+            text_rect.width())
+
+        painter.setPen(QColor(*text_color))
+        painter.drawText(text_rect, __text_alignment__, text)
+
+        if anno.selected:
+            underline_y = rect.center().y() + 11
+
+            painter.setPen(QColor(255, 255, 255, 217))
+            painter.drawLine(indicator.left(), underline_y,
+                             text_rect.right(), underline_y)
+
+        if not anno.kpt_names:
+            return
+
+        arrow_color = (117, 117, 117) \
+            if canvas.keypoints_hidden \
+            or anno.visible != VisibilityType.VISIBLE else (200, 200, 200)
+
+        arrow_rect = QRect(rect.right() - 17, rect.top(), 10, rect.height())
+        arrow = '\u276E' if self.view.isExpanded(index) else '\u276F'
+
+        painter.setPen(QColor(*arrow_color))
+        painter.drawText(arrow_rect, Qt.AlignmentFlag.AlignCenter, arrow)
+
+    def _paint_keypoint(self,
+                        painter: QPainter,
+                        option: QStyleOptionViewItem,
+                        index: QModelIndex
+                        ) -> None:
+        keypoint = index.model().keypoint(index)
+        annotator = self.view.canvas.keypoint_annotator
+        rect = option.rect
+
+        if keypoint is None:
             return  # This can happen on anno rename, before list is redrawn
 
-        annotator = self.parent.canvas.keypoint_annotator
-        hovered = (annotator.label_index == self.keypoint.index
-                   and annotator.active) or self.underMouse()
+        hovered = (annotator.label_index == keypoint.index
+                   and annotator.active) or self.view.hovered is keypoint
 
-        highlighted = hovered or self.keypoint.selected
-        background = 'rgb(53, 53, 53)' if highlighted else 'transparent'
+        if hovered or keypoint.selected:
+            painter.fillRect(rect, QColor(53, 53, 53))
 
-        color = (255, 255, 255) if hovered and self.keypoint.selected \
-            else (200, 200, 200) if self.keypoint.visible else (83, 83, 83)
+        color = (255, 255, 255) if hovered and keypoint.selected \
+            else (200, 200, 200) if keypoint.visible else (83, 83, 83)
 
-        self.keypoint_label.setStyleSheet(f'''
-            background-color: {background};
-            color: rgb{color};
-        ''')
+        painter.setPen(QColor(*color))
+        painter.drawText(rect.adjusted(13, 0, 0, 0), __text_alignment__,
+                         index.model().text(index))
@@ -0,0 +1,247 @@
+from bisect import bisect_left
+from typing import Any
+
+from PyQt6.QtCore import Qt, QAbstractItemModel, QModelIndex, QObject
+
+from app.objects import Annotation, Keypoint
+from app.utils import pretty_text
+
+__reset_threshold__ = 64
+
+
+class AnnotationRow:
+    def __init__(self, key: tuple, annotation: Annotation) -> None:
+        self.key = key
+        self.annotation = annotation
+
+        self.text = pretty_text(annotation.label_name)
+        self.num_keypoints = len(annotation.keypoints)
+
+
+class AnnotationModel(QAbstractItemModel):
+    """Sorted annotations as top-level rows, their keypoints as children.
+
+    Top-level indexes carry no internal pointer, keypoint indexes point to
+    the row of their parent annotation. Rows are kept in sync through
+    `set_annotations`, or `update_annotations` for the annotations touched
+    by an action. Both only insert and remove the rows that changed.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+
+        self._rows: list[AnnotationRow] = []
+        self._positions: dict[str, int] = {}
+
+    @property
+    def annotations(self) -> list[Annotation]:
+        return [row.annotation for row in self._rows]
+
+    def annotation(self, index: QModelIndex) -> Annotation | None:
+        if not index.isValid():
+            return None
+
+        row = index.internalPointer()
+        return self._rows[index.row()].annotation if row is None \
+            else row.annotation
+
+    def keypoint(self, index: QModelIndex) -> Keypoint | None:
+        if not index.isValid() or index.internalPointer() is None:
+            return None
+
+        keypoints = index.internalPointer().annotation.keypoints
+        return keypoints[index.row()] \
+            if index.row() < len(keypoints) else None
+
+    def text(self, index: QModelIndex) -> str:
+        return self.data(index, Qt.ItemDataRole.DisplayRole) or ''
+
+    def index_of(self, annotation: Annotation) -> QModelIndex:
+        return self.index_of_ref_id(annotation.ref_id)
+
+    def index_of_ref_id(self, ref_id: str) -> QModelIndex:
+        position = self._positions.get(ref_id)
+
+        if position is None:
+            return QModelIndex()
+
+        return self.createIndex(position, 0)
+
+    def index(self,
+              row: int,
+              column: int,
+              parent: QModelIndex = QModelIndex()
+              ) -> QModelIndex:
+        if not parent.isValid():
+            if 0 <= row < len(self._rows):
+                return self.createIndex(row, column)
+
+        elif parent.internalPointer() is None:
+            parent_row = self._rows[parent.row()]
+
+            if 0 <= row < parent_row.num_keypoints:
+                return self.createIndex(row, column, parent_row)
+
+        return QModelIndex()
+
+    def parent(self, index: QModelIndex = None) -> QModelIndex | QObject:
+        if index is None:
+            return QObject.parent(self)
+
+        if not index.isValid() or index.internalPointer() is None:
+            return QModelIndex()
+
+        annotation = index.internalPointer().annotation
+        return self.index_of(annotation)
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        if not parent.isValid():
+            return len(self._rows)
+
+        if parent.internalPointer() is None:
+            return self._rows[parent.row()].num_keypoints
+
+        return 0
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 1
+
+    def data(self,
+             index: QModelIndex,
+             role: int = Qt.ItemDataRole.DisplayRole
+             ) -> Any:
+        if not index.isValid() or role != Qt.ItemDataRole.DisplayRole:
+            return None
+
+        row = index.internalPointer()
+
+        if row is None:
+            return self._rows[index.row()].text
+
+        kpt_names = row.annotation.kpt_names
+        return pretty_text(kpt_names[index.row()]) \
+            if index.row() < len(kpt_names) else ''
+
+    def set_annotations(self,
+                        entries: list[tuple[tuple, Annotation]]
+                        ) -> None:
+        """Sync the rows to `entries`, a list of (key, annotation) pairs
+        sorted by key. Rows whose key and keypoint count are unchanged are
+        kept as they are, everything else is removed or inserted in runs.
+        """
+        new_annos = dict(entries)
+
+        stale = [position for position, row in enumerate(self._rows)
+                 if self._is_stale(row, new_annos.get(row.key))]
+        num_inserted = len(entries) - len(self._rows) + len(stale)
+
+        if len(stale) + num_inserted > __reset_threshold__:
+            self.beginResetModel()
+            self._rows = [AnnotationRow(*entry) for entry in entries]
+            self._update_positions()
+            self.endResetModel()
+
+            return
+
+        for first, last in reversed(self._get_runs(stale)):
+            self.beginRemoveRows(QModelIndex(), first, last)
+            del self._rows[first:last + 1]
+            self.endRemoveRows()
+
+        position, entry_idx = 0, 0
+
+        while entry_idx < len(entries):
+            key, anno = entries[entry_idx]
+
+            if position < len(self._rows) and self._rows[position].key == key:
+                self._rows[position].annotation = anno
+                position, entry_idx = position + 1, entry_idx + 1
+
+                continue
+
+            next_key = self._rows[position].key \
+                if position < len(self._rows) else None
+            run_end = entry_idx
+
+            while run_end < len(entries) and entries[run_end][0] != next_key:
+                run_end += 1
+
+            new_rows = [AnnotationRow(*entry)
+                        for entry in entries[entry_idx:run_end]]
+
+            self.beginInsertRows(QModelIndex(), position,
+                                 position + len(new_rows) - 1)
+            self._rows[position:position] = new_rows
+            self.endInsertRows()
+
+            position += len(new_rows)
+            entry_idx = run_end
+
+        self._update_positions()
+
+    def update_annotations(self,
+                           ref_ids: set[str],
+                           entries: list[tuple[tuple, Annotation]]
+                           ) -> None:
+        """Apply a change to the annotations in `ref_ids`, of which
+        `entries` are the (key, annotation) pairs that belong in this model.
+        Rows that keep their key are updated in place, all other rows of
+        `ref_ids` are removed and `entries` inserted at their sorted position.
+        """
+        new_entries = {anno.ref_id: (key, anno) for key, anno in entries}
+        stale = []
+
+        for ref_id in ref_ids:
+            position = self._positions.get(ref_id)
+            if position is None:
+                continue
+
+            row = self._rows[position]
+            key, anno = new_entries.get(ref_id, (None, None))
+
+            if key != row.key or self._is_stale(row, anno):
+                stale.append(position)
+                continue
+
+            row.annotation = anno
+            del new_entries[ref_id]
+
+            index = self.createIndex(position, 0)
+            self.dataChanged.emit(index, index)
+
+        for first, last in reversed(self._get_runs(sorted(stale))):
+            self.beginRemoveRows(QModelIndex(), first, last)
+            del self._rows[first:last + 1]
+            self.endRemoveRows()
+
+        for key, anno in sorted(new_entries.values(),
+                                key=lambda entry: entry[0]):
+            position = bisect_left(self._rows, key, key=lambda row: row.key)
+
+            self.beginInsertRows(QModelIndex(), position, position)
+            self._rows.insert(position, AnnotationRow(key, anno))
+            self.endInsertRows()
+
+        if stale or new_entries:
+            self._update_positions()
+
+    def _update_positions(self) -> None:
+        self._positions = {row.annotation.ref_id: position
+                           for position, row in enumerate(self._rows)}
+
+    @staticmethod
+    def _is_stale(row: AnnotationRow, annotation: Annotation | None) -> bool:
+        return annotation is None \
+            or len(annotation.keypoints) != row.num_keypoints
+
+    @staticmethod
+    def _get_runs(positions: list[int]) -> list[tuple[int, int]]:
+        runs = []
+
+        for position in positions:
+            if runs and runs[-1][1] == position - 1:
+                runs[-1] = runs[-1][0], position
+            else:
+                runs.append((position, position))
+
+        return runs
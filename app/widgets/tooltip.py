@@ -31,6 +31,13 @@ class Tooltip(QLabel):
     def enable(self) -> None:
         self._enabled = True
 
+    def restart(self) -> None:
+        self._timer.stop()
+        self.hide()
+
+        if self._enabled:
+            self._timer.start()
+
     def show(self) -> None:
         self.adjustSize()
 
@@ -0,0 +1,105 @@
+"""Measures the cost of a brightness step on a large image.
+
+A random 8-bit ARGB image is brightened one step at a time, both by the
+tiled lookup used by the brightness handler and by the former approach
+of copying the whole image and fancy indexing it with the lookup table.
+Reports the median time per step and the peak memory numpy allocates.
+
+    python benchmarks/brightness.py [--side N] [--runs N]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Callable
+
+import numpy as np
+
+__root__ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.insert(0, __root__)
+
+from app.handlers.image.adjustments import (  # noqa: E402
+    Adjustments,
+    build_lookup_tables
+)
+from app.handlers.image.brightness import (  # noqa: E402
+    BrightnessHandler,
+    BrightnessJob,
+    BrightnessSignals,
+    BrightnessWorker
+)
+
+
+def get_tiles(array: np.ndarray) -> list[tuple[int, int, int, int]]:
+    height, width, _ = array.shape
+    tile_size = BrightnessHandler._tile_size
+
+    return [
+        (top, left,
+         min(top + tile_size, height),
+         min(left + tile_size, width))
+        for top in range(0, height, tile_size)
+        for left in range(0, width, tile_size)]
+
+
+def apply_tiled(array: np.ndarray,
+                buffer: np.ndarray,
+                tiles: list[tuple[int, int, int, int]],
+                tables: np.ndarray
+                ) -> None:
+    job = BrightnessJob(None, tiles, array, buffer, tables, None, None)
+    BrightnessWorker(job, BrightnessSignals()).run()
+
+
+def apply_copy(array: np.ndarray, tables: np.ndarray) -> None:
+    result = array.copy()
+    result[..., :3] = tables[0][result[..., :3]]
+
+
+def measure(apply: Callable[[np.ndarray], None],
+            runs: int
+            ) -> tuple[float, float]:
+    timings, peaks = [], []
+
+    for step in range(1, runs + 1):
+        tables = build_lookup_tables(Adjustments(gamma=1 - 0.03 * step))
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        apply(tables)
+        timings.append(time.perf_counter() - start)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+    return statistics.median(timings), max(peaks)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--side', type=int, default=7000)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    array = rng.integers(0, 256, (args.side, args.side, 4), dtype=np.uint8)
+    buffer = np.empty_like(array)
+    tiles = get_tiles(array)
+
+    methods = {
+        'tiled': lambda tables: apply_tiled(array, buffer, tiles, tables),
+        'copy': lambda tables: apply_copy(array, tables)
+    }
+
+    print(f'{args.side} x {args.side} pixels, {len(tiles)} tiles')
+
+    for name, apply in methods.items():
+        timing, peak = measure(apply, args.runs)
+        print(f'{name:<8} {timing * 1000:8.1f} ms {peak / 2 ** 20:8.1f} MB '
+              f'(median time, peak memory of {args.runs})')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""Measures the memory held by the annotations of an image.
+
+Builds annotations with a bbox and a full set of keypoints, as loaded
+from a file, and reports the memory they hold along with the time to
+read the index of every keypoint. Only the public API of the objects is
+used, so the figures can be compared across revisions.
+
+    python benchmarks/memory.py [--annotations N] [--keypoints N]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+__root__ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--annotations', type=int, default=5000)
+    parser.add_argument('--keypoints', type=int, default=17)
+    args = parser.parse_args()
+
+    sys.path.insert(0, __root__)
+
+    from app.controllers.label_map_controller import LabelSchema
+    from app.objects import Annotation, Keypoint
+
+    label_schema = LabelSchema(
+        label_name='person',
+        kpt_names=[f'keypoint_{index}' for index in range(args.keypoints)],
+        kpt_edges=[],
+        kpt_symmetry=[])
+
+    rng = random.Random(0)
+
+    tracemalloc.start()
+    annotations = []
+
+    for _ in range(args.annotations):
+        left, top = rng.randrange(4000), rng.randrange(3000)
+        anno = Annotation(label_schema, [left, top, left + 100, top + 200])
+        anno.keypoints = [
+            Keypoint(anno, [left + rng.randrange(100),
+                            top + rng.randrange(200)])
+            for _ in range(args.keypoints)]
+
+        annotations.append(anno)
+
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+
+    for anno in annotations:
+        for keypoint in anno.keypoints:
+            keypoint.index
+
+    index_time = time.perf_counter() - start
+
+    print(f'{args.annotations} annotations x {args.keypoints} keypoints')
+    print(f'{"memory":<8} {memory / 2 ** 20:8.1f} MB')
+    print(f'{"index":<8} {index_time * 1000:8.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""Measures the cost of restyling the keypoint label on each step.
+
+Stepping through the keypoints of a schema changes the text color of the
+keypoint label with the side of the keypoint, and greys out the arrows
+at either end. This compares doing so through dynamic properties matched
+by app.qss, as the label does, with setting a widget style sheet on the
+text and both arrows, as it did before. Each step includes processing
+the events it posts, so the repaint is counted, and the median time per
+step is reported.
+
+    python benchmarks/restyle.py [--steps N] [--keypoints N]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from typing import Callable
+
+__root__ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+__sides__ = ('center', 'left', 'right')
+
+# Same colors as the keypoint label rules of app.qss
+__colors__ = {
+    'center': (220, 220, 220),
+    'left': (57, 109, 191),
+    'right': (153, 46, 46),
+    'placed': (100, 100, 100)
+}
+
+
+def measure(restyle: Callable[[str, bool, bool], None],
+            process_events: Callable[[], None],
+            steps: int,
+            num_keypoints: int
+            ) -> float:
+    timings = []
+
+    for step in range(steps):
+        index = step % num_keypoints
+        state = 'placed' if step % 5 == 0 else __sides__[index % 3]
+
+        start = time.perf_counter()
+        restyle(state, index > 0, index < num_keypoints - 1)
+        process_events()
+        timings.append(time.perf_counter() - start)
+
+    return statistics.median(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--steps', type=int, default=2000)
+    parser.add_argument('--keypoints', type=int, default=17)
+    args = parser.parse_args()
+
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    sys.path.insert(0, __root__)
+    os.chdir(__root__)
+
+    from PyQt6.QtWidgets import QApplication, QWidget
+
+    app = QApplication([])
+
+    import annotator
+    from app.handlers.annotator import KeypointLabel
+
+    annotator.setup_dark_theme(app)
+
+    parent = QWidget()
+    parent.resize(400, 100)
+    keypoint_label = KeypointLabel(parent)
+    keypoint_label.set_text('left_shoulder')
+    parent.show()
+
+    def restyle_properties(state: str,
+                          has_prev: bool,
+                          has_next: bool
+                          ) -> None:
+        keypoint_label.set_state(state)
+        keypoint_label.set_enabled_prev(has_prev)
+        keypoint_label.set_enabled_next(has_next)
+
+    def restyle_style_sheets(state: str,
+                            has_prev: bool,
+                            has_next: bool
+                            ) -> None:
+        disabled = __colors__['placed']
+        enabled = __colors__['center']
+
+        keypoint_label.text_label.setStyleSheet(
+            f'color: rgb{__colors__[state]}; font-weight: bold;')
+        keypoint_label.left_arrow.setStyleSheet(
+            f'color: rgb{enabled if has_prev else disabled};')
+        keypoint_label.right_arrow.setStyleSheet(
+            f'color: rgb{enabled if has_next else disabled};')
+
+    methods = {
+        'properties': restyle_properties,
+        'stylesheets': restyle_style_sheets
+    }
+
+    for name, restyle in methods.items():
+        timing = measure(
+            restyle, app.processEvents, args.steps, args.keypoints)
+        print(f'{name:<12} {timing * 1e6:8.1f} us '
+              f'(median of {args.steps})')
+
+        for label in (keypoint_label.text_label,
+                      keypoint_label.left_arrow,
+                      keypoint_label.right_arrow):
+            label.setStyleSheet('')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""Measures the startup time of the annotator.
+
+Each run starts a fresh interpreter with the offscreen Qt platform, so
+imports are never cached between runs, and reports the median time to
+import the `annotator` module, to construct the main window and to
+receive its first paint event.
+
+With a budget in milliseconds, given by `--budget` or the
+ANNOTATOR_STARTUP_BUDGET environment variable, exits with a non-zero
+status when the median time to the first paint exceeds it.
+
+    python benchmarks/startup.py [--runs N] [--budget MS]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+__root__ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+__stages__ = ('import', 'construct', 'first_paint')
+
+
+def measure() -> dict[str, float]:
+    start = time.perf_counter()
+    sys.path.insert(0, __root__)
+    os.chdir(__root__)
+
+    from PyQt6.QtCore import QEvent, QObject
+    from PyQt6.QtWidgets import QApplication
+
+    app = QApplication([])
+
+    import_start = time.perf_counter()
+    import annotator
+    import_end = time.perf_counter()
+
+    annotator.setup_dark_theme(app)
+    window = annotator.MainWindow()
+    construct_end = time.perf_counter()
+
+    class PaintFilter(QObject):
+        def eventFilter(self, watched: QObject, event: QEvent) -> bool:
+            if event.type() == QEvent.Type.Paint:
+                app.quit()
+
+            return False
+
+    paint_filter = PaintFilter()
+    window.installEventFilter(paint_filter)
+    window.resize(1400, 900)
+    window.show()
+    app.exec()
+    paint_end = time.perf_counter()
+
+    return {
+        'import': import_end - import_start,
+        'construct': construct_end - import_end,
+        'first_paint': paint_end - start
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--budget', type=float,
+                        default=os.environ.get('ANNOTATOR_STARTUP_BUDGET'))
+    parser.add_argument('--once', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.once:
+        print(json.dumps(measure()))
+        return
+
+    timings = {stage: [] for stage in __stages__}
+
+    with tempfile.TemporaryDirectory() as config_dir:
+        # Keep the user's settings, such as the last opened directory,
+        # from changing what is built at startup
+        env = dict(os.environ,
+                   QT_QPA_PLATFORM='offscreen',
+                   XDG_CONFIG_HOME=config_dir)
+
+        for _ in range(args.runs):
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--once'],
+                env=env,
+                capture_output=True,
+                text=True,
+                check=True
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+
+            for stage in __stages__:
+                timings[stage].append(result[stage])
+
+    medians = {stage: statistics.median(timings[stage]) * 1000
+               for stage in __stages__}
+
+    for stage, median in medians.items():
+        print(f'{stage:<12} {median:8.1f} ms (median of {args.runs})')
+
+    if args.budget is not None and medians['first_paint'] > args.budget:
+        sys.exit(f'first_paint exceeds the budget of {args.budget:.1f} ms')
+
+
+if __name__ == '__main__':
+    main()